@@ -0,0 +1,78 @@
+# api/load_test.py
+"""
+Minimal closed-loop load generator for the /query endpoint (stdlib only).
+
+    RAG_STUB_LLM=1 uvicorn api.main:app --port 8000 &
+    python -m api.load_test --url http://127.0.0.1:8000 --session s1 -n 500 -c 16
+
+Reports throughput, latency percentiles and status-code counts (429s show
+where backpressure kicks in).
+"""
+from __future__ import annotations
+
+import json
+import time
+import argparse
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+
+def _one(url: str, body: bytes, timeout: float) -> Tuple[int, float]:
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0  # connection error / timeout
+    return status, time.perf_counter() - t0
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[idx]
+
+
+def run(url: str, session: str, question: str, requests: int, concurrency: int, timeout: float = 60.0) -> dict:
+    endpoint = url.rstrip("/") + "/query"
+    body = json.dumps({"session_id": session, "question": question}).encode()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: _one(endpoint, body, timeout), range(requests)))
+    wall = time.perf_counter() - t0
+
+    ok = sorted(lat for status, lat in results if status == 200)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "rps": round(requests / wall, 2) if wall else 0.0,
+        "ok_rps": round(len(ok) / wall, 2) if wall else 0.0,
+        "status": dict(Counter(status for status, _ in results)),
+        "latency_ms": {f"p{p}": round(percentile(ok, p) * 1000, 2) for p in (50, 90, 95, 99)},
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Load-test the RAG /query endpoint")
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--session", default="session")
+    ap.add_argument("--question", default="What is the main topic of the document?")
+    ap.add_argument("-n", "--requests", type=int, default=200)
+    ap.add_argument("-c", "--concurrency", type=int, default=8)
+    ap.add_argument("--timeout", type=float, default=60.0)
+    args = ap.parse_args()
+    report = run(args.url, args.session, args.question, args.requests, args.concurrency, args.timeout)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
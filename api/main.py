@@ -0,0 +1,364 @@
+# api/main.py
+"""
+FastAPI serving layer.
+
+Models, the shared HTTP client and per-session FAISS indexes are loaded once
+and reused by every request. Upload bodies are parsed as they arrive and each
+file is written straight to disk, then handed to the background
+IngestionJobQueue. Uploads and queries sit behind concurrency limits that answer
+429 (and oversized bodies 413) before the body is read, instead of queueing
+without bound.
+
+    uvicorn api.main:app --host 0.0.0.0 --port 8000
+
+Environment: RAG_DATA_DIR, RAG_FAISS_DIR, RAG_MAX_QUERIES, RAG_MAX_UPLOADS,
+RAG_INGEST_WORKERS, RAG_STUB_LLM=1 (echo LLM, for load tests without Groq),
+RAG_CONTEXT_TOKENS (enables rerank + context compression to this budget),
+RAG_FETCH_K, RAG_RERANKER=cross-encoder (default: lexical BM25).
+"""
+from __future__ import annotations
+
+import os
+import re
+import time
+import uuid
+import threading
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from logger.custom_logger import CustomLogger
+from ingestor.job_queue import FaissUnitHandler, IngestionJobQueue
+from utils import metrics
+
+try:
+    from python_multipart import MultipartParser
+    from python_multipart.multipart import parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart import MultipartParser
+    from multipart.multipart import parse_options_header
+
+
+class EchoLLM:
+    """Local stand-in for ChatGroq: takes the chat prompt and echoes the question back."""
+
+    def invoke(self, prompt):
+        from langchain_core.messages import AIMessage
+        messages = prompt.to_messages() if hasattr(prompt, "to_messages") else []
+        return AIMessage(content=messages[-1].content if messages else str(prompt))
+
+
+class ConcurrencyLimiter:
+    """Non-blocking in-flight cap for one event loop: over the limit -> 429."""
+
+    def __init__(self, name: str, limit: int) -> None:
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.in_flight >= self.limit:
+            metrics.count("rag_http_rejected_total", help="Requests rejected with 429", route=self.name)
+            raise HTTPException(status_code=429, detail=f"Too many concurrent {self.name} requests",
+                                headers={"Retry-After": "1"})
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+
+class QueryRequest(BaseModel):
+    session_id: str
+    question: str
+
+
+class RAGService:
+    """Process-wide state shared by all requests."""
+
+    def __init__(
+        self,
+        data_dir: str | Path = "data/uploads",
+        faiss_base: str | Path = "faiss_index",
+        model_loader=None,
+        llm=None,
+        k: int = 5,
+        ingest_workers: int = 2,
+        jobs_db: Optional[str | Path] = None,
+        compressor=None,
+    ) -> None:
+        self.log = CustomLogger.get_logger(__name__)
+        self.data_dir = Path(data_dir)
+        self.faiss_base = Path(faiss_base)
+        self.model_loader = model_loader
+        self.llm = llm
+        self.k = k
+        self.ingest_workers = ingest_workers
+        self.compressor = compressor
+        self.jobs_db = Path(jobs_db) if jobs_db else self.data_dir / "ingest_jobs.sqlite"
+        self.http_client = None
+        self.handler: Optional[FaissUnitHandler] = None
+        self.queue: Optional[IngestionJobQueue] = None
+        self._rags: Dict[str, Any] = {}
+        self._rag_lock = threading.Lock()
+
+    def startup(self) -> None:
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        if self.model_loader is None:
+            import httpx
+            from utils.model_loader import ModelLoader
+            self.http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+            )
+            self.model_loader = ModelLoader(http_client=self.http_client)
+        embeddings = self.model_loader.load_embeddings()
+        if self.compressor is not None and getattr(self.compressor.count, "tokenizer", True) is None:
+            # count context tokens with the embedding model's tokenizer instead of chars/4
+            from ingestor.chunker import TokenCounter
+            self.compressor.count = TokenCounter.from_embeddings(embeddings)
+        if self.llm is None:
+            self.llm = self.model_loader.load_llm()
+        self.handler = FaissUnitHandler(self.faiss_base, self.model_loader, embeddings=embeddings)
+        self.queue = IngestionJobQueue(self.jobs_db, handler=self.handler, workers=self.ingest_workers)
+        self.queue.start()
+        self.log.info("RAG service started", data_dir=str(self.data_dir), faiss_base=str(self.faiss_base))
+
+    def shutdown(self) -> None:
+        if self.queue is not None:
+            self.queue.stop(timeout=5)
+        if self.http_client is not None:
+            self.http_client.close()
+
+    def rag(self, session_id: str):
+        """SimpleRAG over the session's shared FAISS store; None if nothing is indexed yet."""
+        from eval.rag_adapter import SimpleRAG
+        fm, lock = self.handler.manager(session_id)
+        rag = self._rags.get(session_id)
+        if rag is not None:
+            if fm.stale():  # another server process saved new vectors for this session
+                with lock:
+                    fm.refresh()
+            return rag
+        # first query for this session: only this session waits on its own lock, never
+        # while holding _rag_lock, so other sessions' queries are not held up
+        with lock:
+            if fm.vs is None:
+                if not fm._exists():
+                    return None
+                fm.load_or_create()
+        with self._rag_lock:
+            rag = self._rags.get(session_id)
+            if rag is None:
+                # the job queue adds to this same store in place, so the retriever stays current;
+                # searches take the read side of the lock the queue holds while it writes
+                retriever = fm.vs.as_retriever(search_type="similarity", search_kwargs={"k": self.k})
+                rag = self._rags[session_id] = SimpleRAG(retriever, llm=self.llm, compressor=self.compressor,
+                                                         read_lock=lock.read)
+            return rag
+
+
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def _session_id(session_id: str) -> str:
+    """Session ids name directories on disk, so only a plain token is accepted."""
+    if not _SESSION_ID.match(session_id):
+        raise HTTPException(status_code=400, detail="session_id must match [A-Za-z0-9_-]{1,64}")
+    return session_id
+
+
+def _safe_name(name: Optional[str]) -> str:
+    name = Path(name or "upload.bin").name or "upload.bin"
+    if name in (".", ".."):
+        raise HTTPException(status_code=400, detail=f"Invalid file name: {name!r}")
+    return name
+
+
+def _compressor_from_env():
+    budget = os.getenv("RAG_CONTEXT_TOKENS")
+    if not budget:
+        return None
+    from ingestor.context_compressor import ContextCompressor, CrossEncoderScorer
+    scorer = CrossEncoderScorer() if os.getenv("RAG_RERANKER", "").lower() == "cross-encoder" else None
+    return ContextCompressor(scorer=scorer, token_budget=int(budget), fetch_k=int(os.getenv("RAG_FETCH_K", "20")))
+
+
+class StreamingUpload:
+    """
+    Incremental multipart/form-data parser: every file part is written to a
+    temporary name in dest_dir as its bytes arrive and renamed into place when
+    the part ends. Nothing is spooled in memory or to a second temp file.
+    """
+
+    def __init__(self, dest_dir: Path, boundary: bytes, max_bytes: int) -> None:
+        self.dest_dir = dest_dir
+        self.max_bytes = max_bytes
+        self.received = 0
+        self.saved: List[Path] = []
+        self._tmp: Optional[Path] = None
+        self._dest: Optional[Path] = None
+        self._out = None
+        self._headers: Dict[bytes, bytes] = {}
+        self._field = self._value = b""
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self._part_begin,
+            "on_header_field": lambda data, start, end: self._add(data[start:end], "_field"),
+            "on_header_value": lambda data, start, end: self._add(data[start:end], "_value"),
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        })
+
+    def _add(self, data: bytes, attr: str) -> None:
+        setattr(self, attr, getattr(self, attr) + data)
+
+    def _part_begin(self) -> None:
+        self._headers = {}
+
+    def _header_end(self) -> None:
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+
+    def _headers_finished(self) -> None:
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = params.get(b"filename")
+        if filename is None:
+            return  # plain form field: ignored
+        name = _safe_name(filename.decode("utf-8", "replace"))
+        self._dest = self.dest_dir / name
+        self._tmp = self.dest_dir / f".{name}.{uuid.uuid4().hex[:8]}.part"
+        self._out = open(self._tmp, "wb")
+
+    def _part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._out is not None:
+            self._out.write(data[start:end])
+
+    def _part_end(self) -> None:
+        if self._out is None:
+            return
+        self._out.close()
+        os.replace(self._tmp, self._dest)  # workers only ever see complete files
+        self.saved.append(self._dest)
+        self._out = self._tmp = self._dest = None
+
+    def write(self, chunk: bytes) -> None:
+        self.received += len(chunk)
+        if self.received > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {self.max_bytes} bytes")
+        self.parser.write(chunk)
+
+    def finish(self) -> None:
+        self.parser.finalize()
+
+    def abort(self) -> None:
+        """Remove everything this upload wrote (partial part included)."""
+        if self._out is not None:
+            self._out.close()
+        for p in [*self.saved, *([self._tmp] if self._tmp else [])]:
+            p.unlink(missing_ok=True)
+        try:
+            self.dest_dir.rmdir()
+        except OSError:
+            pass
+
+
+def create_app(
+    service: Optional[RAGService] = None,
+    max_concurrent_queries: Optional[int] = None,
+    max_concurrent_uploads: Optional[int] = None,
+    max_upload_bytes: int = 200 * 1024 * 1024,
+) -> FastAPI:
+    if service is None:
+        service = RAGService(
+            data_dir=os.getenv("RAG_DATA_DIR", "data/uploads"),
+            faiss_base=os.getenv("RAG_FAISS_DIR", "faiss_index"),
+            llm=EchoLLM() if os.getenv("RAG_STUB_LLM") else None,
+            ingest_workers=int(os.getenv("RAG_INGEST_WORKERS", "2")),
+            compressor=_compressor_from_env(),
+        )
+    queries = ConcurrencyLimiter("query", max_concurrent_queries or int(os.getenv("RAG_MAX_QUERIES", "16")))
+    uploads = ConcurrencyLimiter("upload", max_concurrent_uploads or int(os.getenv("RAG_MAX_UPLOADS", "4")))
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await run_in_threadpool(service.startup)
+        try:
+            yield
+        finally:
+            await run_in_threadpool(service.shutdown)
+
+    app = FastAPI(title="Universal Doc RAG", lifespan=lifespan)
+    app.state.service = service
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "queries_in_flight": queries.in_flight, "uploads_in_flight": uploads.in_flight}
+
+    @app.post("/sessions/{session_id}/documents", status_code=202)
+    async def upload(session_id: str, request: Request):
+        """multipart/form-data with one or more file parts; the body is read only after the checks below."""
+        session_id = _session_id(session_id)
+        async with uploads.slot():
+            length = request.headers.get("content-length")
+            if length is not None and not length.isdigit():
+                raise HTTPException(status_code=400, detail="Invalid Content-Length")
+            if length is not None and int(length) > max_upload_bytes:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {max_upload_bytes} bytes")
+            ctype, params = parse_options_header(request.headers.get("content-type", ""))
+            if ctype != b"multipart/form-data" or not params.get(b"boundary"):
+                raise HTTPException(status_code=415, detail="Expected multipart/form-data")
+            # one directory per upload: a re-upload never replaces a file an earlier job is still reading
+            batch_dir = service.data_dir / session_id / uuid.uuid4().hex[:12]
+            batch_dir.mkdir(parents=True)
+            body = StreamingUpload(batch_dir, params[b"boundary"], max_upload_bytes)
+            try:
+                async for chunk in request.stream():
+                    await run_in_threadpool(body.write, chunk)
+                await run_in_threadpool(body.finish)
+                if not body.saved:
+                    raise HTTPException(status_code=400, detail="No files in upload")
+            except BaseException:
+                await run_in_threadpool(body.abort)
+                raise
+            job_id = await run_in_threadpool(service.queue.submit, body.saved, session_id)
+            return {"job_id": job_id, "files": [p.name for p in body.saved]}
+
+    @app.get("/jobs/{job_id}")
+    async def job_progress(job_id: str):
+        prog = await run_in_threadpool(service.queue.progress, job_id)
+        if prog is None:
+            raise HTTPException(status_code=404, detail="Unknown job")
+        return prog
+
+    @app.post("/query")
+    async def query(req: QueryRequest):
+        session_id = _session_id(req.session_id)
+        async with queries.slot():
+            t0 = time.perf_counter()
+            rag = await run_in_threadpool(service.rag, session_id)
+            if rag is None:
+                raise HTTPException(status_code=404, detail="No index for this session yet")
+            answer, stats = await run_in_threadpool(rag.invoke_with_stats, req.question)
+            body = {"answer": answer, "latency_ms": round((time.perf_counter() - t0) * 1000, 2)}
+            if stats is not None:
+                body["prompt_tokens_saved"] = stats.tokens_saved
+                body["prompt_tokens_estimated"] = stats.estimated
+                body["context"] = stats.to_dict()
+            return body
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def prometheus():
+        return metrics.render_prometheus()
+
+    return app
+
+
+app = create_app()
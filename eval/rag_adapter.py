@@ -1,13 +1,23 @@
 # ingestor/rag_adapter.py
 import sys
+import copy
 from typing import List, Tuple
-from operator import itemgetter
+from contextlib import nullcontext
 
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
 from langchain_community.vectorstores import FAISS
 from utils.model_loader import ModelLoader
 from exception.custom_exception import DocumentPortalException
 from logger.custom_logger import CustomLogger
+from utils import metrics
+
+SYSTEM_PROMPT = (
+    "You are an assistant for question-answering over the user's documents. "
+    "Answer using only the context below. If the answer is not in the context, say you don't know.\n\n"
+    "Context:\n{context}"
+)
 
 
 class SimpleRAG:
@@ -16,42 +26,71 @@ class SimpleRAG:
     we are using FAISS retriever + LLM from ModelLoader.
     """
 
-    def __init__(self, retriever):
+    def __init__(self, retriever, llm=None, compressor=None, read_lock=None):
         try:
             self.log = CustomLogger.get_logger(__name__)
+            # pass a shared llm to avoid building a client per instance
+            self.llm = llm if llm is not None else ModelLoader().load_llm()
+            # optional ContextCompressor: over-fetch, rerank, dedupe, trim to a token budget
+            self.compressor = compressor
+            # optional callable returning a context manager held around each search,
+            # e.g. ReadWriteLock.read when another thread updates the index in place
+            self.read_lock = read_lock
+            self.baseline_k = None
+            search_kwargs = getattr(retriever, "search_kwargs", None)
+            if compressor is not None and isinstance(search_kwargs, dict):
+                self.baseline_k = search_kwargs.get("k", 4)
+                # over-fetch on a copy: the caller's retriever may be shared (e.g. cached per session)
+                retriever = copy.copy(retriever)
+                retriever.search_kwargs = {**search_kwargs, "k": max(compressor.fetch_k, self.baseline_k)}
             self.retriever = retriever
-            self.llm = ModelLoader().load_llm()
             self._build_chain()
             self.log.info("SimpleRAG initialized")
         except Exception as e:
             self.log.error("Failed to init SimpleRAG", error=str(e))
-            raise DocumentPortalException("Initialization error in SimpleRAG", sys) from e
+            raise DocumentPortalException("Initialization error in SimpleRAG", sys, code="RAG_INIT") from e
 
     def _build_chain(self):
-        """LCEL pipeline: retriever -> LLM -> text output"""
+        """LCEL pipeline: prompt -> LLM -> text output; retrieval runs first in invoke_with_stats()"""
         try:
-            def format_docs(docs):
-                return "\n\n".join(d.page_content for d in docs)
-
-            self.chain = (
-                {
-                    "context": self.retriever | format_docs,
-                    "input": itemgetter("input"),
-                }
-                | self.llm
-                | StrOutputParser()
-            )
+            self.prompt = ChatPromptTemplate.from_messages([("system", SYSTEM_PROMPT), ("human", "{input}")])
+            self.answer_chain = self.prompt | RunnableLambda(self._generate) | StrOutputParser()
             self.log.info("LCEL chain built")
         except Exception as e:
             self.log.error("Error building LCEL chain", error=str(e))
-            raise DocumentPortalException("Chain build error", sys) from e
+            raise DocumentPortalException("Chain build error", sys, code="RAG_CHAIN_BUILD") from e
+
+    @staticmethod
+    def _format_docs(docs) -> str:
+        return "\n\n".join(d.page_content for d in docs)
+
+    def _retrieve(self, inputs: dict):
+        """(docs, CompressionStats or None) for the question in inputs."""
+        question = inputs["input"]
+        with metrics.timer("retrieval"), (self.read_lock() if self.read_lock else nullcontext()):
+            docs = self.retriever.invoke(question)
+        if self.compressor is None:
+            return docs, None
+        docs, stats = self.compressor.compress(question, docs, baseline_k=self.baseline_k)
+        self.log.info("Context compressed", **stats.to_dict())
+        return docs, stats
+
+    def _generate(self, prompt):
+        with metrics.timer("llm"):
+            return self.llm.invoke(prompt)
 
     def invoke(self, question: str) -> str:
         """Answer a user query."""
+        return self.invoke_with_stats(question)[0]
+
+    def invoke_with_stats(self, question: str):
+        """(answer, CompressionStats or None) so callers can report prompt tokens saved."""
         try:
-            result = self.chain.invoke({"input": question})
+            with metrics.timer("query"):
+                docs, stats = self._retrieve({"input": question})
+                result = self.answer_chain.invoke({"context": self._format_docs(docs), "input": question})
             self.log.info("Chain invoked successfully")
-            return result
+            return result, stats
         except Exception as e:
             self.log.error("Error invoking SimpleRAG", error=str(e))
-            raise DocumentPortalException("Invoke error in SimpleRAG", sys) from e
+            raise DocumentPortalException("Invoke error in SimpleRAG", sys, code="RAG_INVOKE", stage="query") from e
@@ -1,30 +1,125 @@
 import sys
 import traceback
-from logger.custom_logger import CustomLogger  
+from contextlib import contextmanager
+from logger.custom_logger import CustomLogger
+
+logger = CustomLogger().get_logger(__file__)
 
-logger = CustomLogger().get_logger(__file__)  
 
 class DocumentPortalException(Exception):
-    def __init__(self, error_message, error_details):
-        exc_type, exc_value, exc_tb = error_details.exc_info()
-        self.file_name = exc_tb.tb_frame.f_code.co_filename
-        self.lineno = exc_tb.tb_lineno
+    """
+    Application error carrying an error code and structured context.
+
+    The traceback is captured but only formatted when the exception is rendered
+    (str() / traceback_str), so wrapping errors on hot paths stays cheap.
+
+        raise DocumentPortalException("Table extraction error", sys,
+                                      code="TABLE_EXTRACTION", file="a.pdf", stage="table_extract") from e
+    """
+
+    default_code = "DOCUMENT_PORTAL_ERROR"
+
+    def __init__(self, error_message, error_details=sys, *, code=None, **context):
+        if isinstance(error_details, BaseException):
+            exc_info = (type(error_details), error_details, error_details.__traceback__)
+        elif hasattr(error_details, "exc_info"):
+            exc_info = error_details.exc_info()
+        else:
+            exc_info = (None, None, None)
+        super().__init__(str(error_message))
+
+        _, _, exc_tb = exc_info
+        self.file_name = exc_tb.tb_frame.f_code.co_filename if exc_tb else "<unknown>"
+        self.lineno = exc_tb.tb_lineno if exc_tb else 0
         self.error_message = str(error_message)
-        self.traceback_str = ''.join(traceback.format_exception(exc_type, exc_value, exc_tb))
+        self.code = code or self.default_code
+        self.context = {k: v for k, v in context.items() if v is not None}
+        self._exc_info = exc_info
+        self._traceback_str = None
+
+    @property
+    def traceback_str(self):
+        if self._traceback_str is None:
+            exc_type, exc_value, exc_tb = self._exc_info
+            if exc_type is None:
+                self._traceback_str = ""
+            else:
+                self._traceback_str = ''.join(traceback.format_exception(exc_type, exc_value, exc_tb))
+        return self._traceback_str
+
+    def to_dict(self):
+        """Structured form for JSON logs / API error bodies (no traceback)."""
+        return {"code": self.code, "message": self.error_message, "file_name": self.file_name,
+                "lineno": self.lineno, **self.context}
 
     def __str__(self):
+        context = " ".join(f"{k}={v}" for k, v in self.context.items())
         return f"""
-        Error in [{self.file_name}] at line [{self.lineno}]
+        [{self.code}] Error in [{self.file_name}] at line [{self.lineno}]
         Message: {self.error_message}
+        Context: {context}
         Traceback:
         {self.traceback_str}
         """
 
+
+class ErrorCollector:
+    """
+    Aggregates repeated failures (e.g. per page) into one report instead of
+    logging each. Only the exception type and message are kept, and only the
+    first `max_samples` of them.
+
+        errors = ErrorCollector(stage="table_extract", file=path.name)
+        for page_idx, page in enumerate(pages, start=1):
+            with errors.capture(page=page_idx):
+                ...
+        errors.log_summary(self.log)
+    """
+
+    def __init__(self, stage, max_samples=5, **context):
+        self.stage = stage
+        self.max_samples = max_samples
+        self.context = context
+        self.count = 0
+        self.by_type = {}
+        self.samples = []
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, exc, **context):
+        name = type(exc).__name__
+        self.count += 1
+        self.by_type[name] = self.by_type.get(name, 0) + 1
+        if len(self.samples) < self.max_samples:
+            self.samples.append({"type": name, "message": str(exc), **context})
+
+    @contextmanager
+    def capture(self, **context):
+        """Record and swallow any exception raised inside the block."""
+        try:
+            yield
+        except Exception as e:
+            self.add(e, **context)
+
+    def report(self):
+        return {"stage": self.stage, **self.context, "failures": self.count,
+                "by_type": dict(self.by_type), "samples": list(self.samples)}
+
+    def log_summary(self, log, message="Aggregated failures"):
+        """Emit a single warning for everything collected (no-op when empty)."""
+        if self.count:
+            log.warning("%s: %s in %s", message, self.count, self.stage, **self.report())
+
+
 if __name__ == "__main__":
     try:
-        a = 1 / 0  
+        a = 1 / 0
     except Exception as e:
-        logger.exception("Original exception:")  
+        logger.exception("Original exception:")
         app_exc = DocumentPortalException(e, sys)
-        logger.error(str(app_exc))              
+        logger.error(str(app_exc))
         raise app_exc
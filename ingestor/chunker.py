@@ -0,0 +1,301 @@
+# ingestor/chunker.py
+"""
+Token-aware chunking with boilerplate removal and deterministic chunk ids.
+
+- Budgets are measured with the embedding model's own tokenizer when it is
+  reachable (sentence-transformers), else a ~4 chars/token estimate.
+  Chunker.for_embeddings() also caps the budget at the model's max_seq_length.
+- Chunks never cross a page; paragraphs are packed whole and only split when a
+  single paragraph exceeds the budget. PDF tables found by TableExtractor
+  become their own chunks (split by rows with the header repeated).
+- Running headers/footers are lines within the first/last few lines of a page
+  that repeat on most pages. They are matched exactly, except page-number
+  lines ("Page 3 of 10", or a bare "7" on page 7), and dropped before chunking.
+- PDF table regions are cut out of the page text, so a table is embedded once,
+  as its table chunks.
+- chunk_id = hash(source + normalized text), so identical content always gets
+  the same id across runs. Duplicates within a document are dropped.
+"""
+from __future__ import annotations
+
+import re
+import hashlib
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from logger.custom_logger import CustomLogger
+from utils import metrics
+
+_PARA_SPLIT = re.compile(r"\n\s*\n")
+_WS = re.compile(r"\s+")
+_PAGE_LABEL = re.compile(r"^page\s+\d+(?:\s*(?:of|/)\s*\d+)?$|^\d+\s*(?:of|/)\s*\d+$")
+_BARE_NUMBER = re.compile(r"^(\d+)$|^-\s*(\d+)\s*-$")
+
+
+def normalize(text: str) -> str:
+    return _WS.sub(" ", text).strip().lower()
+
+
+def _line_key(line: str, page: int) -> str:
+    # only page-number lines are collapsed ("Page 3 of 10" == "Page 7 of 10"), and a bare
+    # number only when it is this page's number; other lines must repeat verbatim
+    norm = normalize(line)
+    bare = _BARE_NUMBER.match(norm)
+    if _PAGE_LABEL.match(norm) or (bare and int(bare.group(1) or bare.group(2)) == page):
+        norm = "<page>"
+    return hashlib.md5(norm.encode()).hexdigest()
+
+
+def _text_outside(page, regions: Sequence[Tuple[float, float, float, float]]) -> str:
+    """PyMuPDF page text without the words whose centre lies in one of `regions`."""
+    if not regions:
+        return page.get_text()
+    lines: Dict[Tuple[int, int], List[str]] = {}
+    for x0, y0, x1, y1, word, block, line, _ in page.get_text("words"):
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        if not any(l <= cx <= r and t <= cy <= b for l, t, r, b in regions):
+            lines.setdefault((block, line), []).append(word)
+    return "".join(" ".join(words) + "\n" for words in lines.values())
+
+
+def chunk_id(source: str, text: str) -> str:
+    return hashlib.sha1(f"{source}\x00{normalize(text)}".encode()).hexdigest()[:16]
+
+
+class TokenCounter:
+    """Counts tokens with a HF tokenizer if given, otherwise estimates. Results are memoized."""
+
+    def __init__(self, tokenizer=None, cache_size: int = 65536) -> None:
+        self.tokenizer = tokenizer
+        if tokenizer is not None:
+            encode = lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+        else:
+            encode = lambda text: max(1, (len(text) + 3) // 4)
+        self._count = lru_cache(maxsize=cache_size)(encode)
+
+    def __call__(self, text: str) -> int:
+        return self._count(text)
+
+    @classmethod
+    def from_embeddings(cls, embeddings) -> "TokenCounter":
+        """Use the tokenizer behind HuggingFaceEmbeddings (SentenceTransformer.tokenizer) if present."""
+        client = getattr(embeddings, "client", None)
+        return cls(getattr(client, "tokenizer", None))
+
+
+def render_table(df) -> str:
+    """DataFrame -> CSV text with the header as the first line (what _table_chunks repeats)."""
+    has_header = not all(isinstance(c, int) for c in df.columns)
+    return df.to_csv(index=False, header=has_header).strip()
+
+
+@dataclass
+class _Block:
+    text: str
+    tokens: int
+    kind: str = "text"
+
+
+class Chunker:
+    def __init__(
+        self,
+        max_tokens: int = 384,
+        overlap_tokens: int = 48,
+        token_counter: Optional[Callable[[str], int]] = None,
+        boilerplate_ratio: float = 0.5,
+        min_boilerplate_pages: int = 3,
+        edge_lines: int = 3,
+        table_extractor=None,
+        extract_tables: bool = True,
+    ) -> None:
+        self.log = CustomLogger.get_logger(__name__)
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self.count = token_counter or TokenCounter()
+        self.boilerplate_ratio = boilerplate_ratio
+        self.min_boilerplate_pages = min_boilerplate_pages
+        self.edge_lines = edge_lines
+        self.table_extractor = table_extractor
+        self.extract_tables = extract_tables
+        self._splitter = RecursiveCharacterTextSplitter(
+            chunk_size=max_tokens, chunk_overlap=self.overlap_tokens, length_function=self.count,
+        )
+
+    @classmethod
+    def for_embeddings(cls, embeddings, max_tokens: int = 384, **kwargs) -> "Chunker":
+        """Chunker counting with the embedding model's tokenizer, budget capped at its max_seq_length."""
+        max_seq = getattr(getattr(embeddings, "client", None), "max_seq_length", None)
+        if max_seq:
+            max_tokens = min(max_tokens, max_seq - 2)  # room for [CLS]/[SEP]
+        return cls(max_tokens=max_tokens, token_counter=TokenCounter.from_embeddings(embeddings), **kwargs)
+
+    # ---------- Boilerplate ----------
+    def _edges(self, lines: List[str]) -> Set[int]:
+        """Indexes of the first/last `edge_lines` non-empty lines: where headers and footers live."""
+        filled = [i for i, ln in enumerate(lines) if ln.strip()]
+        return set(filled[:self.edge_lines] + filled[-self.edge_lines:])
+
+    def boilerplate_keys(self, pages: Sequence[Tuple[int, str]]) -> Set[str]:
+        if len(pages) < self.min_boilerplate_pages:
+            return set()
+        seen = Counter()
+        for page, text in pages:
+            lines = text.splitlines()
+            seen.update({_line_key(lines[i], page) for i in self._edges(lines) if len(lines[i]) <= 200})
+        threshold = max(self.min_boilerplate_pages, self.boilerplate_ratio * len(pages))
+        return {k for k, n in seen.items() if n >= threshold}
+
+    def _strip(self, text: str, keys: Set[str], page: int) -> str:
+        if not keys:
+            return text
+        lines = text.splitlines()
+        edges = self._edges(lines)
+        return "\n".join(ln for i, ln in enumerate(lines) if i not in edges or _line_key(ln, page) not in keys)
+
+    # ---------- Packing ----------
+    def _blocks(self, text: str) -> List[_Block]:
+        blocks: List[_Block] = []
+        for para in _PARA_SPLIT.split(text):
+            para = para.strip()
+            if not para:
+                continue
+            n = self.count(para)
+            if n <= self.max_tokens:
+                blocks.append(_Block(para, n))
+            else:
+                blocks.extend(_Block(p, self.count(p)) for p in self._splitter.split_text(para))
+        return blocks
+
+    def _pack(self, blocks: List[_Block]) -> List[str]:
+        chunks: List[str] = []
+        cur: List[_Block] = []
+        size = 0
+        for b in blocks:
+            if cur and size + b.tokens > self.max_tokens:
+                chunks.append("\n\n".join(x.text for x in cur))
+                # carry trailing paragraphs as overlap, within the token budget
+                carry: List[_Block] = []
+                carried = 0
+                for x in reversed(cur):
+                    if carried + x.tokens > self.overlap_tokens or carried + x.tokens + b.tokens > self.max_tokens:
+                        break
+                    carry.insert(0, x)
+                    carried += x.tokens
+                cur, size = carry, carried
+            cur.append(b)
+            size += b.tokens
+        if cur:
+            chunks.append("\n\n".join(x.text for x in cur))
+        return chunks
+
+    def _table_chunks(self, table_text: str) -> List[str]:
+        """Split a rendered table by rows, repeating the header line in every piece."""
+        if self.count(table_text) <= self.max_tokens:
+            return [table_text]
+        header, *rows = table_text.splitlines()
+        budget = self.max_tokens - self.count(header)
+        pieces: List[str] = []
+        cur: List[str] = []
+        size = 0
+        for row in rows:
+            n = self.count(row)
+            if cur and size + n > budget:
+                pieces.append("\n".join([header, *cur]))
+                cur, size = [], 0
+            cur.append(row)
+            size += n
+        if cur:
+            pieces.append("\n".join([header, *cur]))
+        return pieces
+
+    # ---------- Public API ----------
+    def split_text(self, text: str) -> List[str]:
+        """Split one text to the token budget (no boilerplate removal, no page bookkeeping)."""
+        return self._pack(self._blocks(text))
+
+    def split_pages(
+        self,
+        pages: Sequence[Tuple[int, str]],
+        source: str,
+        tables: Iterable[Tuple[int, str]] = (),
+    ) -> List[Document]:
+        """
+        pages: (page_number, text) pairs; tables: (page_number, rendered table text).
+        Returns Documents with source/page/kind/chunk_id/tokens metadata.
+        """
+        with metrics.timer("chunk", file=source):
+            keys = self.boilerplate_keys(pages)
+            seen: Set[str] = set()
+            docs: List[Document] = []
+            dropped = 0
+
+            def emit(text: str, page: int, kind: str) -> None:
+                nonlocal dropped
+                cid = chunk_id(source, text)
+                if cid in seen:
+                    dropped += 1
+                    return
+                seen.add(cid)
+                docs.append(Document(page_content=text, metadata={
+                    "source": source, "page": page, "kind": kind, "chunk_id": cid, "tokens": self.count(text),
+                }))
+
+            for page, text in pages:
+                for chunk in self._pack(self._blocks(self._strip(text, keys, page))):
+                    emit(chunk, page, "text")
+            for page, table_text in tables:
+                for chunk in self._table_chunks(table_text.strip()):
+                    if chunk:
+                        emit(chunk, page, "table")
+
+        metrics.count("rag_chunks_total", len(docs), help="Chunks produced")
+        if keys or dropped:
+            self.log.info("Chunked document", source=source, chunks=len(docs),
+                          boilerplate_lines=len(keys), duplicate_chunks=dropped)
+        return docs
+
+    def _table_frames(self, path: Path, page_range: Optional[Tuple[int, int]]) -> list:
+        """Non-empty TableExtractor DataFrames; text chunks still go out if extraction fails."""
+        if not self.extract_tables:
+            return []
+        try:
+            if self.table_extractor is None:
+                from ingestor.table_extractor import TableExtractor
+                self.table_extractor = TableExtractor()
+            dfs = self.table_extractor.extract(path, page_range=page_range)
+        except Exception as e:
+            self.log.warning("Table extraction skipped", file=path.name, error=str(e))
+            return []
+        return [df for df in dfs if not df.empty]
+
+    def chunk_file(self, path: str | Path, page_range: Optional[Tuple[int, int]] = None) -> List[Document]:
+        """Chunk a PDF (optionally pages [start, end)), with its tables, or a text-like file."""
+        path = Path(path)
+        ext = path.suffix.lower()
+        if ext == ".pdf":
+            import fitz  # PyMuPDF
+            with fitz.open(str(path)) as pdf:
+                start, end = page_range or (0, pdf.page_count)
+                frames = self._table_frames(path, (start, end))
+                regions: Dict[int, list] = {}
+                for df in frames:
+                    if df.attrs.get("bbox"):
+                        regions.setdefault(df.attrs.get("page", 1), []).append(df.attrs["bbox"])
+                with metrics.timer("parse", file=path.name):
+                    pages = [(i + 1, _text_outside(pdf.load_page(i), regions.get(i + 1, ())))
+                             for i in range(start, end)]
+            tables = [(df.attrs.get("page", 1), render_table(df)) for df in frames]
+            return self.split_pages(pages, path.name, tables=tables)
+        if ext in (".txt", ".md", ".csv"):
+            return self.split_pages([(1, path.read_text(encoding="utf-8", errors="ignore"))], path.name)
+        self.log.warning("Unsupported for chunking: %s", ext)
+        return []
+
+
+__all__ = ["Chunker", "TokenCounter", "chunk_id", "normalize", "render_table"]
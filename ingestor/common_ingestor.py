@@ -1,47 +1,214 @@
 # ---- minimal exports for tests ----
 from pathlib import Path
-from typing import List, Optional, Iterable
+from typing import Dict, List, Optional, Iterable, Tuple
 
 try:
     
     from ingestor.common_ingestor import FaissManager  
 except Exception:
     
-    import json, hashlib
+    import os, json, hashlib
     from langchain_community.vectorstores import FAISS
     from utils.model_loader import ModelLoader
+    from utils.file_lock import file_lock
+    from utils import metrics
 
     class FaissManager:
-        def __init__(self, index_dir: Path, model_loader: Optional[ModelLoader] = None):
+        def __init__(self, index_dir: Path, model_loader: Optional[ModelLoader] = None, embeddings=None):
             self.index_dir = Path(index_dir)
             self.index_dir.mkdir(parents=True, exist_ok=True)
-            self.model_loader = model_loader or ModelLoader()
-            self.emb = self.model_loader.load_embeddings()
+            # pass already-loaded embeddings to share one model across many indexes
+            self.model_loader = model_loader if embeddings is not None else (model_loader or ModelLoader())
+            self.emb = embeddings if embeddings is not None else self.model_loader.load_embeddings()
             self.vs = None
+            self._meta_path = self.index_dir / "ingested_meta.json"
+            self._meta = self._load_meta()
+            # mtime of index.faiss when this process last loaded/saved it; other processes
+            # writing the same directory change it, see stale()/refresh()
+            self._loaded_mtime = None
+
+        def _load_meta(self) -> dict:
+            if self._meta_path.exists():
+                return json.loads(self._meta_path.read_text(encoding="utf-8"))
+            return {"rows": {}, "row_ids": {}}
+
+        def _save_meta(self) -> None:
+            tmp = self._meta_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self._meta), encoding="utf-8")
+            os.replace(tmp, self._meta_path)
+
+        @staticmethod
+        def _fingerprint(text: str, metadata: Optional[dict]) -> str:
+            """Chunker's chunk_id when present, else a hash of source + content."""
+            md = metadata or {}
+            if md.get("chunk_id"):
+                return str(md["chunk_id"])
+            return hashlib.sha1(f"{md.get('source', '')}\x00{text}".encode()).hexdigest()[:16]
 
         def _exists(self) -> bool:
             p = self.index_dir
             return (p / "index.faiss").exists() and (p / "index.pkl").exists()
 
+        def _lock(self):
+            """Cross-process write lock: every process writing this index reloads, adds and saves under it."""
+            return file_lock(self.index_dir / ".lock")
+
+        def _mtime(self) -> Optional[int]:
+            try:
+                return (self.index_dir / "index.faiss").stat().st_mtime_ns
+            except FileNotFoundError:
+                return None
+
+        def stale(self) -> bool:
+            """True if the index on disk changed since this process loaded or saved it."""
+            return self._exists() and self._mtime() != self._loaded_mtime
+
+        def _reload(self) -> None:
+            """Load index + meta from disk; an existing vs is updated in place so retrievers stay valid."""
+            with metrics.timer("faiss_load"):
+                fresh = FAISS.load_local(str(self.index_dir), embeddings=self.emb, allow_dangerous_deserialization=True)
+            if self.vs is None:
+                self.vs = fresh
+            else:
+                self.vs.index = fresh.index
+                self.vs.docstore = fresh.docstore
+                self.vs.index_to_docstore_id = fresh.index_to_docstore_id
+            self._meta = self._load_meta()
+            self._reconcile_meta()
+            self._loaded_mtime = self._mtime()
+
+        def _reconcile_meta(self) -> None:
+            """
+            The index is saved before the meta file, so a crash in between leaves the meta
+            behind the index: adopt vectors it doesn't list (a resumed unit then skips them
+            instead of re-adding) and forget ids the index no longer has (replaced rows).
+            """
+            rows = self._meta.setdefault("rows", {})
+            row_ids = self._meta.setdefault("row_ids", {})
+            in_index = set(self.vs.index_to_docstore_id.values())
+            gone = [fp for fp in rows if fp not in in_index]
+            missing = [fp for fp in in_index if fp not in rows]
+            for fp in gone:
+                del rows[fp]
+            for rid in list(row_ids):
+                row_ids[rid] = [fp for fp in self._row_fps(row_ids[rid]) if fp in in_index]
+                if not row_ids[rid]:
+                    del row_ids[rid]
+            for fp in missing:
+                doc = self.vs.docstore.search(fp)
+                md = getattr(doc, "metadata", None) or {}
+                rows[fp] = md.get("source", "")
+                if md.get("row_id"):
+                    row_ids.setdefault(md["row_id"], []).append(fp)
+            if gone or missing:
+                self._save_meta()
+
+        def _save(self) -> None:
+            with metrics.timer("faiss_save"):
+                self.vs.save_local(str(self.index_dir))
+            self._save_meta()
+            self._loaded_mtime = self._mtime()
+
+        def refresh(self) -> bool:
+            """Pick up vectors another process saved. Returns True if the index was reloaded."""
+            if not self.stale():
+                return False
+            with self._lock():
+                if not self.stale():
+                    return False
+                self._reload()
+                return True
+
         def load_or_create(self, texts: Optional[List[str]] = None, metadatas: Optional[List[dict]] = None):
-            if self._exists():
-                self.vs = FAISS.load_local(str(self.index_dir), embeddings=self.emb, allow_dangerous_deserialization=True)
-                return self.vs
-            if not texts:
-                raise ValueError("No existing FAISS index and no data to create one")
-            self.vs = FAISS.from_texts(texts=texts, embedding=self.emb, metadatas=metadatas or [])
-            self.vs.save_local(str(self.index_dir))
+            if texts:
+                from langchain_core.documents import Document
+                metadatas = metadatas or [{} for _ in texts]
+                # creates the index, or adds to one another process created in the meantime
+                self.add_embedded(self.embed([Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]))
+                if self.vs is not None:
+                    return self.vs
+            with self._lock():  # nothing new to add: just load
+                if not self._exists():
+                    raise ValueError("No existing FAISS index and no data to create one")
+                self._reload()
             return self.vs
 
+        @staticmethod
+        def _row_fps(value) -> List[str]:
+            """row_ids values: a list of part fingerprints (a single string in older meta files)."""
+            if not value:
+                return []
+            return [value] if isinstance(value, str) else list(value)
+
         def add_documents(self, docs) -> int:
-            if self.vs is None:
-                raise RuntimeError("Call load_or_create() first")
-            added = len(docs) if docs else 0
-            if added:
-                self.vs.add_documents(docs)  
-                self.vs.save_local(str(self.index_dir))
-            return added
+            """Embed and add docs, loading or creating the index as needed; usable as an ingest sink."""
+            return self.add_embedded(self.embed(docs))
+
+        def _new_docs(self, docs) -> Dict[str, object]:
+            """fingerprint -> doc for chunks not embedded yet (re-uploads, resumed jobs, overlapping batches)."""
+            rows = self._meta.get("rows", {})
+            new = {}
+            for d in docs or []:
+                fp = self._fingerprint(d.page_content, d.metadata)
+                if fp not in rows and fp not in new:
+                    new[fp] = d
+            return new
+
+        def embed(self, docs) -> List[Tuple[str, object, List[float]]]:
+            """
+            Embed the chunks this index doesn't have yet, without touching the index:
+            callers run this outside their write lock and pass the result to add_embedded().
+            """
+            new = self._new_docs(docs)
+            skipped = len(docs or []) - len(new)
+            if skipped:
+                metrics.count("rag_documents_deduplicated_total", skipped, help="Known chunks skipped")
+            if not new:
+                return []
+            with metrics.timer("embed", docs=len(new)):
+                vectors = self.emb.embed_documents([d.page_content for d in new.values()])
+            return [(fp, d, v) for (fp, d), v in zip(new.items(), vectors)]
 
+        def add_embedded(self, embedded: List[Tuple[str, object, List[float]]]) -> int:
+            """Add (fingerprint, doc, vector) rows from embed(); creates the index if there is none."""
+            if not embedded:
+                return 0
+            with self._lock():
+                if self._exists() and (self.vs is None or self.stale()):
+                    self._reload()  # another process added vectors since we loaded
+                rows = self._meta.setdefault("rows", {})
+                row_ids = self._meta.setdefault("row_ids", {})
+                new = {}
+                for fp, d, v in embedded:  # re-check: the index may have changed while we embedded
+                    if fp not in rows and fp not in new:
+                        new[fp] = (d, v)
+                if not new:
+                    return 0
+                by_row: Dict[str, List[str]] = {}
+                for fp, (d, _) in new.items():
+                    if d.metadata.get("row_id"):
+                        by_row.setdefault(d.metadata["row_id"], []).append(fp)
+                pairs = [(d.page_content, v) for d, v in new.values()]
+                metas = [d.metadata for d, _ in new.values()]
+                if self.vs is None:
+                    with metrics.timer("faiss_create", texts=len(new)):
+                        self.vs = FAISS.from_embeddings(pairs, embedding=self.emb, metadatas=metas, ids=list(new))
+                else:
+                    # a new version of a known row (metadata row_id, e.g. an updated SQL row) replaces its old vectors
+                    stale = [old for rid, fps in by_row.items()
+                             for old in self._row_fps(row_ids.get(rid)) if old not in fps]
+                    if stale:
+                        with metrics.timer("faiss_delete", docs=len(stale)):
+                            self.vs.delete(stale)
+                        for fp in stale:
+                            rows.pop(fp, None)
+                    with metrics.timer("faiss_add", docs=len(new)):
+                        self.vs.add_embeddings(pairs, metadatas=metas, ids=list(new))
+                rows.update({fp: d.metadata.get("source", "") for fp, (d, _) in new.items()})
+                row_ids.update(by_row)
+                self._save()
+            metrics.count("rag_documents_indexed_total", len(new), help="Documents added to FAISS")
+            return len(new)
 
 class ChatIngestor:
     def __init__(self, temp_base: str = "data", faiss_base: str = "faiss_index", use_session_dirs: bool = True, session_id: Optional[str] = None):
@@ -49,17 +216,47 @@ class ChatIngestor:
         self.faiss_base = Path(faiss_base)
         self.use_session = use_session_dirs
         self.session_id = session_id or "session"
-        self.temp_base.mkdir(parents=True, exist_ok=True)
-        self.faiss_base.mkdir(parents=True, exist_ok=True)
+        self.temp_dir = self.temp_base / self.session_id if self.use_session else self.temp_base
+        self.faiss_dir = self.faiss_base / self.session_id if self.use_session else self.faiss_base
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        self.faiss_dir.mkdir(parents=True, exist_ok=True)
+
+    def save_files(self, uploaded_files: Iterable) -> List[Path]:
+        """Copy uploads (.name + .read()/.getbuffer(), or plain paths) into temp_dir."""
+        import shutil
+        saved: List[Path] = []
+        for uf in uploaded_files:
+            if isinstance(uf, (str, Path)):
+                src = Path(uf)
+                dest = self.temp_dir / src.name
+                if src.resolve() != dest.resolve():
+                    shutil.copyfile(src, dest)
+            else:
+                dest = self.temp_dir / Path(getattr(uf, "name", "upload.bin")).name
+                with metrics.timer("file_save", file=dest.name), open(dest, "wb") as f:
+                    if hasattr(uf, "read"):
+                        shutil.copyfileobj(uf, f, 1 << 20)
+                    else:
+                        f.write(uf.getbuffer())
+            saved.append(dest)
+        return saved
+
+    def enqueue(self, uploaded_files: Iterable, job_queue) -> str:
+        """Save uploads and hand them to an IngestionJobQueue; returns the job id without blocking on embedding."""
+        return job_queue.submit(self.save_files(uploaded_files), session_id=self.session_id)
 
-    
     def build_retriever(self, uploaded_files: Iterable, *, k: int = 5):
         from utils.model_loader import ModelLoader
-        from langchain_community.vectorstores import FAISS
+        from ingestor.chunker import Chunker
         ml = ModelLoader()
-        emb = ml.load_embeddings()
-        fm = FaissManager(self.faiss_base / self.session_id, ml)
-        vs = fm.load_or_create(texts=["placeholder"], metadatas=[{}])  
+        fm = FaissManager(self.faiss_dir, ml)
+        chunker = Chunker.for_embeddings(fm.emb)
+        docs = [d for p in self.save_files(uploaded_files) for d in chunker.chunk_file(p)]
+        if fm._exists():
+            vs = fm.load_or_create()
+            fm.add_documents(docs)
+        else:
+            vs = fm.load_or_create(texts=[d.page_content for d in docs], metadatas=[d.metadata for d in docs])
         return vs.as_retriever(search_type="similarity", search_kwargs={"k": k})
 
 __all__ = ["FaissManager", "ChatIngestor"]
@@ -68,6 +265,7 @@ __all__ = ["FaissManager", "ChatIngestor"]
 import os
 from pathlib import Path
 import fitz  # PyMuPDF
+from utils import metrics
 
 class DocHandler:
     """
@@ -87,20 +285,28 @@ class DocHandler:
         if not filename.lower().endswith(".pdf"):
             raise ValueError("Invalid file type. Only PDFs are allowed.")
         save_path = self.session_path / filename
-        with open(save_path, "wb") as f:
-            if hasattr(uploaded_file, "read"):
-                f.write(uploaded_file.read())
-            else:
-                f.write(uploaded_file.getbuffer())
+        with metrics.timer("file_save", file=filename):
+            with open(save_path, "wb") as f:
+                if hasattr(uploaded_file, "read"):
+                    f.write(uploaded_file.read())
+                else:
+                    f.write(uploaded_file.getbuffer())
         return str(save_path)
 
     def read_pdf(self, pdf_path: str) -> str:
         text_chunks: list[str] = []
-        with fitz.open(pdf_path) as doc:
-            for i in range(doc.page_count):
-                page = doc.load_page(i)
-                text_chunks.append(f"\n--- Page {i+1} ---\n{page.get_text()}")
+        with metrics.timer("parse", file=Path(pdf_path).name):
+            with fitz.open(pdf_path) as doc:
+                for i in range(doc.page_count):
+                    page = doc.load_page(i)
+                    text_chunks.append(f"\n--- Page {i+1} ---\n{page.get_text()}")
+        metrics.count("rag_pages_parsed_total", len(text_chunks), help="PDF pages parsed")
         return "\n".join(text_chunks)
 
+    def chunk_pdf(self, pdf_path: str, chunker=None):
+        """Token-budgeted chunks with page metadata (see ingestor.chunker)."""
+        from ingestor.chunker import Chunker
+        return (chunker or Chunker()).chunk_file(pdf_path)
+
 
 __all__ = [*(__all__ if "__all__" in globals() else []), "DocHandler"]
@@ -0,0 +1,190 @@
+# ingestor/context_compressor.py
+"""
+Post-retrieval rerank + context compression.
+
+Over-fetched candidates are scored against the query in batches. The scorer is
+a lexical BM25 over the candidate set by default, or a local CPU cross-encoder.
+Then, in score order:
+  1. paragraphs already included by a better chunk are removed (chunk overlap),
+  2. chunks that are near-duplicates of a kept chunk are dropped,
+  3. chunks are added until the token budget is reached (the first one is
+     truncated rather than dropped if it alone is over budget).
+
+compress() returns the kept docs and a CompressionStats with the prompt tokens
+saved against the plain top-k context.
+"""
+from __future__ import annotations
+
+import math
+import re
+import hashlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.documents import Document
+
+from ingestor.chunker import TokenCounter, normalize
+from utils import metrics
+
+_TOKEN = re.compile(r"\w+")
+TOKEN_BUCKETS = (0, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+def _terms(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class LexicalScorer:
+    """BM25 with IDF computed over the candidate set; no model, microseconds per doc."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+
+    def score(self, query: str, texts: Sequence[str], batch_size: int = 64) -> List[float]:
+        docs = [_terms(t) for t in texts]
+        if not docs:
+            return []
+        n = len(docs)
+        avgdl = sum(len(d) for d in docs) / n or 1.0
+        df = Counter(t for d in docs for t in set(d))
+        q = set(_terms(query))
+        idf = {t: math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5)) for t in q}
+        scores: List[float] = []
+        for d in docs:
+            tf = Counter(d)
+            norm = self.k1 * (1 - self.b + self.b * len(d) / avgdl)
+            scores.append(sum(idf[t] * tf[t] * (self.k1 + 1) / (tf[t] + norm) for t in q if tf[t]))
+        return scores
+
+
+class CrossEncoderScorer:
+    """sentence-transformers CrossEncoder on CPU, loaded on first use."""
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", device: str = "cpu") -> None:
+        self.model_name = model_name
+        self.device = device
+        self._model = None
+
+    def score(self, query: str, texts: Sequence[str], batch_size: int = 32) -> List[float]:
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+            self._model = CrossEncoder(self.model_name, device=self.device)
+        if not texts:
+            return []
+        return [float(s) for s in self._model.predict([(query, t) for t in texts], batch_size=batch_size)]
+
+
+@dataclass
+class CompressionStats:
+    candidates: int
+    kept: int
+    tokens_baseline: int
+    tokens_after: int
+    estimated: bool = False  # counted as ~4 chars/token, no tokenizer available
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_baseline - self.tokens_after
+
+    def to_dict(self) -> dict:
+        return {"candidates": self.candidates, "kept": self.kept, "tokens_baseline": self.tokens_baseline,
+                "tokens_after": self.tokens_after, "tokens_saved": self.tokens_saved,
+                "tokens_estimated": self.estimated}
+
+
+def _shingles(text: str, n: int = 3) -> Set[str]:
+    words = _terms(text)
+    return {" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+
+
+class ContextCompressor:
+    def __init__(
+        self,
+        scorer=None,
+        token_budget: int = 1500,
+        fetch_k: int = 20,
+        top_n: Optional[int] = None,
+        batch_size: int = 32,
+        dedup_threshold: float = 0.8,
+        token_counter: Optional[Callable[[str], int]] = None,
+    ) -> None:
+        self.scorer = scorer or LexicalScorer()
+        self.token_budget = token_budget
+        self.fetch_k = fetch_k
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.dedup_threshold = dedup_threshold
+        self.count = token_counter or TokenCounter()
+
+    def _truncate(self, text: str, budget: int) -> str:
+        words = text.split()
+        lo, hi = 0, len(words)
+        while lo < hi:  # longest word prefix that fits
+            mid = (lo + hi + 1) // 2
+            if self.count(" ".join(words[:mid])) <= budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        return " ".join(words[:lo])
+
+    def compress(self, query: str, docs: Sequence[Document], baseline_k: Optional[int] = None
+                 ) -> Tuple[List[Document], CompressionStats]:
+        """
+        docs: candidates in retriever order. baseline_k: how many of them the
+        prompt would have used without this stage (defaults to all).
+        """
+        docs = list(docs)
+        baseline = docs[:baseline_k] if baseline_k else docs
+        tokens_baseline = sum(self.count(d.page_content) for d in baseline)
+
+        with metrics.timer("rerank", candidates=len(docs)):
+            scores = self.scorer.score(query, [d.page_content for d in docs], batch_size=self.batch_size)
+        ranked = [d for _, _, d in sorted(zip(scores, range(len(docs)), docs), key=lambda x: (-x[0], x[1]))]
+
+        with metrics.timer("compress"):
+            kept: List[Document] = []
+            kept_shingles: List[Set[str]] = []
+            seen_paras: Set[str] = set()
+            seen_ids: Set[str] = set()
+            used = 0
+            for d in ranked:
+                if self.top_n and len(kept) >= self.top_n:
+                    break
+                cid = d.metadata.get("chunk_id")
+                if cid and cid in seen_ids:
+                    continue
+                paras = [p for p in d.page_content.split("\n\n") if p.strip()]
+                fresh = [p for p in paras if hashlib.md5(normalize(p).encode()).hexdigest() not in seen_paras]
+                if not fresh:
+                    continue
+                text = "\n\n".join(fresh)
+                sh = _shingles(text)
+                if any(len(sh & k) / (len(sh | k) or 1) >= self.dedup_threshold for k in kept_shingles):
+                    continue
+                n = self.count(text)
+                if used + n > self.token_budget:
+                    if kept:
+                        continue  # a smaller, lower-ranked chunk may still fit
+                    text = self._truncate(text, self.token_budget)
+                    n = self.count(text)
+                    if not text:
+                        break
+                kept.append(Document(page_content=text, metadata=dict(d.metadata)) if text != d.page_content else d)
+                kept_shingles.append(sh)
+                seen_paras.update(hashlib.md5(normalize(p).encode()).hexdigest() for p in fresh)
+                if cid:
+                    seen_ids.add(cid)
+                used += n
+
+        stats = CompressionStats(len(docs), len(kept), tokens_baseline, used,
+                                 estimated=getattr(self.count, "tokenizer", None) is None)
+        metrics.observe("rag_prompt_tokens_saved", stats.tokens_saved, help="Context tokens saved per query",
+                        buckets=TOKEN_BUCKETS)
+        metrics.observe("rag_prompt_context_tokens", used, help="Context tokens sent per query",
+                        buckets=TOKEN_BUCKETS)
+        return kept, stats
+
+
+__all__ = ["ContextCompressor", "CompressionStats", "LexicalScorer", "CrossEncoderScorer"]
@@ -14,7 +14,8 @@ from pptx import Presentation
 from pptx.enum.shapes import MSO_SHAPE_TYPE
 
 from logger.custom_logger import CustomLogger
-from exception.custom_exception import DocumentPortalException
+from exception.custom_exception import DocumentPortalException, ErrorCollector
+from utils import metrics
 
 
 class ImageExtractor:
@@ -38,17 +39,26 @@ class ImageExtractor:
                 self.log.warning("Unsupported for image extraction: %s", ext)
                 return []
 
-            if ext == ".pdf":
-                return self._from_pdf(path, tag)
-            if ext == ".docx":
-                return self._from_docx(path, tag)
-            if ext == ".pptx":
-                return self._from_pptx(path, tag)
-            # regular image: copy
-            return [self._copy_image(path, tag)]
+            with metrics.timer("image_extract", file=path.name, ext=ext):
+                saved = self._dispatch(path, ext, tag)
+            metrics.count("rag_images_extracted_total", len(saved), help="Images extracted", ext=ext)
+            return saved
         except Exception as e:
             self.log.error("Failed to extract images: %s", e)
-            raise DocumentPortalException("Image extraction error", sys) from e
+            raise DocumentPortalException(
+                "Image extraction error", sys, code="IMAGE_EXTRACTION",
+                file=Path(file_path).name, stage="image_extract",
+            ) from e
+
+    def _dispatch(self, path: Path, ext: str, tag: str) -> List[Path]:
+        if ext == ".pdf":
+            return self._from_pdf(path, tag)
+        if ext == ".docx":
+            return self._from_docx(path, tag)
+        if ext == ".pptx":
+            return self._from_pptx(path, tag)
+        # regular image: copy
+        return [self._copy_image(path, tag)]
 
     # ---------- Implementations ----------
     def _from_pdf(self, path: Path, tag: str) -> List[Path]:
@@ -68,21 +78,24 @@ class ImageExtractor:
             self.log.debug("pdfplumber image pass failed: %s (will use fitz)", e)
 
         
+        errors = ErrorCollector(stage="image_extract", file=path.name)
         try:
             doc = fitz.open(str(path))
             for i in range(len(doc)):
                 page = doc[i]
                 for img_idx, img in enumerate(page.get_images(full=True), start=1):
-                    xref = img[0]
-                    base = f"{tag}_p{i+1}_{img_idx}.png"
-                    out_path = self.out_dir / base
-                    pix = fitz.Pixmap(doc, xref)
-                    if pix.alpha:  # handle RGBA
-                        pix = fitz.Pixmap(fitz.csRGB, pix)
-                    pix.save(str(out_path))
-                    saved.append(out_path)
+                    with errors.capture(page=i + 1, image=img_idx):
+                        xref = img[0]
+                        base = f"{tag}_p{i+1}_{img_idx}.png"
+                        out_path = self.out_dir / base
+                        pix = fitz.Pixmap(doc, xref)
+                        if pix.alpha:  # handle RGBA
+                            pix = fitz.Pixmap(fitz.csRGB, pix)
+                        pix.save(str(out_path))
+                        saved.append(out_path)
         except Exception as e:
             self.log.warning("PyMuPDF image extraction failed: %s", e)
+        errors.log_summary(self.log, "PDF image extraction errors")
 
         self.log.info("PDF images extracted: %s | file=%s", len(saved), path.name)
         return saved
@@ -0,0 +1,496 @@
+# ingestor/job_queue.py
+"""
+Background ingestion queue with SQLite-persisted, checkpointed work units.
+
+A job is one upload batch; each file (or page range of a PDF) is a unit. Units
+are marked done only after their handler returns, so a worker that crashes or
+restarts picks up the remaining pending/running units instead of starting over.
+Running units carry their owner and a heartbeat; only units whose heartbeat is
+older than `stale_after` are reclaimed, so several processes (uvicorn --workers N)
+can share one database without stealing each other's work.
+
+    q = IngestionJobQueue("data/ingest_jobs.sqlite", workers=2)
+    q.start()
+    job_id = q.submit(["data/s1/report.pdf"], session_id="s1")
+    q.progress(job_id)   # {"status": "running", "percent": 40.0, ...}
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import socket
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from logger.custom_logger import CustomLogger
+from exception.custom_exception import DocumentPortalException
+from utils import metrics
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    file_path TEXT NOT NULL,
+    page_start INTEGER,
+    page_end INTEGER,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    added INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_at REAL,
+    timings TEXT,
+    not_before REAL
+);
+CREATE INDEX IF NOT EXISTS idx_units_status ON units(status, id);
+CREATE INDEX IF NOT EXISTS idx_units_job ON units(job_id);
+"""
+
+# columns added after the first release; ALTERed into older databases
+_UNIT_COLUMNS = {"claimed_by": "TEXT", "claimed_at": "REAL", "timings": "TEXT", "not_before": "REAL"}
+
+
+@dataclass(frozen=True)
+class IngestUnit:
+    """One checkpointed slice of work: a file, or pages [page_start, page_end) of a PDF."""
+    id: int
+    job_id: str
+    session_id: str
+    file_path: str
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+
+    @property
+    def pages(self) -> int:
+        if self.page_start is None or self.page_end is None:
+            return 1
+        return self.page_end - self.page_start
+
+
+UnitHandler = Callable[[IngestUnit], int]
+
+
+class ReadWriteLock:
+    """
+    Many readers or one writer. `with lock:` takes the write side (index updates),
+    `with lock.read():` the shared side (searches). Waiting writers block new
+    readers so a steady query load cannot starve ingestion.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield self
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    def __enter__(self):
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        return self
+
+    def __exit__(self, *exc) -> None:
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+class FaissUnitHandler:
+    """
+    Default handler: chunk and embed the unit's pages, then add them to the
+    session's FAISS index. Only the add + save is serialized against other
+    writes and searches (see ReadWriteLock); different sessions run in parallel.
+    Chunks already in the index are skipped, so a unit re-run after a crash
+    does not duplicate vectors.
+    """
+
+    def __init__(self, faiss_base: str | Path = "faiss_index", model_loader=None, embeddings=None,
+                 chunker=None) -> None:
+        self.faiss_base = Path(faiss_base)
+        self.model_loader = model_loader
+        self.embeddings = embeddings
+        self.chunker = chunker
+        self._managers: Dict[str, object] = {}
+        self._locks: Dict[str, ReadWriteLock] = {}
+        self._guard = threading.Lock()
+
+    def manager(self, session_id: str):
+        """(FaissManager, ReadWriteLock) for a session, created once and reused."""
+        from ingestor.common_ingestor import FaissManager
+        with self._guard:
+            if session_id not in self._managers:
+                self._managers[session_id] = FaissManager(self.faiss_base / session_id, self.model_loader,
+                                                          embeddings=self.embeddings)
+                self._locks[session_id] = ReadWriteLock()
+            return self._managers[session_id], self._locks[session_id]
+
+    def _chunker(self, fm):
+        if self.chunker is None:
+            from ingestor.chunker import Chunker
+            self.chunker = Chunker.for_embeddings(fm.emb)
+        return self.chunker
+
+    def __call__(self, unit: IngestUnit) -> int:
+        fm, lock = self.manager(unit.session_id)
+        page_range = (unit.page_start, unit.page_end) if unit.page_start is not None else None
+        docs = self._chunker(fm).chunk_file(unit.file_path, page_range)
+        # embedding is the slow part and runs outside the lock, so searches continue meanwhile;
+        # the write lock only covers the in-memory add and the save
+        embedded = fm.embed(docs)
+        if not embedded:
+            return 0
+        with lock:
+            return fm.add_embedded(embedded)
+
+
+class IngestionJobQueue:
+    def __init__(
+        self,
+        db_path: str | Path = "data/ingest_jobs.sqlite",
+        handler: Optional[UnitHandler] = None,
+        workers: int = 2,
+        pages_per_unit: int = 25,
+        max_attempts: int = 3,
+        stale_after: float = 300.0,
+        retry_backoff: float = 5.0,
+    ) -> None:
+        self.log = CustomLogger.get_logger(__name__)
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.handler = handler or FaissUnitHandler()
+        self.workers = workers
+        self.pages_per_unit = pages_per_unit
+        self.max_attempts = max_attempts
+        self.stale_after = stale_after
+        self.retry_backoff = retry_backoff  # seconds before retry n is retry_backoff * 2 ** (n - 1)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._heartbeat: Optional[threading.Thread] = None
+        self._heartbeat_stop = threading.Event()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        have = {r["name"] for r in conn.execute("PRAGMA table_info(units)")}
+        for name, sql_type in _UNIT_COLUMNS.items():
+            if name not in have:
+                conn.execute(f"ALTER TABLE units ADD COLUMN {name} {sql_type}")
+
+    # ---------- SQLite ----------
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------- Submission ----------
+    def _plan(self, file_path: str) -> List[tuple]:
+        path = Path(file_path)
+        if path.suffix.lower() != ".pdf":
+            return [(str(path), None, None)]
+        import fitz  # PyMuPDF
+        with fitz.open(str(path)) as pdf:
+            n = pdf.page_count
+        step = max(1, self.pages_per_unit)
+        return [(str(path), s, min(s + step, n)) for s in range(0, n, step)] or [(str(path), 0, 0)]
+
+    def submit(self, file_paths: Iterable[str | Path], session_id: str = "session") -> str:
+        """Persist a job and its units; returns the job id immediately."""
+        try:
+            units = [u for fp in file_paths for u in self._plan(str(fp))]
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("INSERT INTO jobs VALUES (?, ?, ?, ?, ?)",
+                             (job_id, session_id, PENDING if units else DONE, now, now))
+                conn.executemany(
+                    "INSERT INTO units (job_id, file_path, page_start, page_end, status, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(job_id, fp, s, e, PENDING, now) for fp, s, e in units],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self.log.info("Ingestion job submitted", job_id=job_id, session_id=session_id, units=len(units))
+            with self._wakeup:
+                self._wakeup.notify_all()
+            return job_id
+        except Exception as e:
+            self.log.error("Failed to submit ingestion job", error=str(e))
+            raise DocumentPortalException("Job submission error", sys, code="JOB_SUBMIT", stage="ingest_queue") from e
+
+    # ---------- Worker loop ----------
+    def _settle_job(self, conn: sqlite3.Connection, job_id: str, now: float) -> None:
+        """Mark a job done/failed once none of its units is pending or running."""
+        open_units = conn.execute("SELECT COUNT(*) FROM units WHERE job_id = ? AND status IN (?, ?)",
+                                  (job_id, PENDING, RUNNING)).fetchone()[0]
+        if not open_units:
+            failed = conn.execute("SELECT COUNT(*) FROM units WHERE job_id = ? AND status = ?",
+                                  (job_id, FAILED)).fetchone()[0]
+            conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                         (FAILED if failed else DONE, now, job_id))
+
+    def _fail_abandoned(self, conn: sqlite3.Connection, now: float) -> int:
+        """
+        Stale running units that already used max_attempts (e.g. a PDF that kills
+        its worker every time) become FAILED instead of being reclaimed forever.
+        """
+        rows = conn.execute(
+            "SELECT id, job_id, attempts FROM units WHERE status = ? AND attempts >= ? "
+            "AND COALESCE(claimed_at, updated_at) < ?", (RUNNING, self.max_attempts, now - self.stale_after),
+        ).fetchall()
+        for r in rows:
+            conn.execute("UPDATE units SET status = ?, claimed_by = NULL, error = ?, updated_at = ? WHERE id = ?",
+                         (FAILED, f"Worker lost during attempt {r['attempts']}", now, r["id"]))
+        for job_id in {r["job_id"] for r in rows}:
+            self._settle_job(conn, job_id, now)
+        if rows:
+            self.log.warning("Ingestion units failed after repeated worker loss", units=len(rows))
+        return len(rows)
+
+    def _claim(self) -> Optional[IngestUnit]:
+        """Take the next due pending unit, or a running one whose owner stopped heartbeating."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._fail_abandoned(conn, now)
+            row = conn.execute(
+                "SELECT u.*, j.session_id FROM units u JOIN jobs j ON j.id = u.job_id "
+                "WHERE (u.status = ? AND COALESCE(u.not_before, 0) <= ?) "
+                "OR (u.status = ? AND COALESCE(u.claimed_at, u.updated_at) < ?) "
+                "ORDER BY u.id LIMIT 1", (PENDING, now, RUNNING, now - self.stale_after),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE units SET status = ?, attempts = attempts + 1, claimed_by = ?, claimed_at = ?, "
+                "updated_at = ? WHERE id = ?", (RUNNING, self.owner, now, now, row["id"]),
+            )
+            conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                         (RUNNING, now, row["job_id"], PENDING))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return IngestUnit(row["id"], row["job_id"], row["session_id"], row["file_path"],
+                          row["page_start"], row["page_end"])
+
+    def _finish(self, unit: IngestUnit, added: int = 0, error: Optional[str] = None,
+                timings: Optional[Dict[str, float]] = None) -> None:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if error is None:
+                cur = conn.execute(
+                    "UPDATE units SET status = ?, added = ?, error = NULL, claimed_by = NULL, timings = ?, "
+                    "updated_at = ? WHERE id = ? AND status = ? AND claimed_by = ?",
+                    (DONE, added, json.dumps(timings) if timings else None, now, unit.id, RUNNING, self.owner),
+                )
+            else:
+                row = conn.execute("SELECT attempts FROM units WHERE id = ?", (unit.id,)).fetchone()
+                not_before = now + self.retry_backoff * 2 ** max(0, (row["attempts"] if row else 1) - 1)
+                cur = conn.execute(
+                    "UPDATE units SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, error = ?, "
+                    "not_before = ?, claimed_by = NULL, updated_at = ? WHERE id = ? AND status = ? AND claimed_by = ?",
+                    (self.max_attempts, FAILED, PENDING, error, not_before, now, unit.id, RUNNING, self.owner),
+                )
+            if not cur.rowcount:
+                # our heartbeat lapsed and another worker reclaimed the unit; its result wins
+                conn.execute("COMMIT")
+                self.log.warning("Ingestion unit was reclaimed by another worker", unit=unit.id, job_id=unit.job_id)
+                return
+            self._settle_job(conn, unit.job_id, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def run_one(self) -> bool:
+        """Process a single pending unit in the calling thread. False if none are left."""
+        self._start_heartbeat()
+        unit = self._claim()
+        if unit is None:
+            return False
+        name = Path(unit.file_path).name
+        try:
+            with metrics.document_context(name, job_id=unit.job_id) as doc, \
+                    metrics.timer("ingest_unit", pages=unit.pages):
+                added = int(self.handler(unit) or 0)
+        except Exception as e:
+            self.log.warning("Ingestion unit failed", unit=unit.id, job_id=unit.job_id,
+                             file=name, error=str(e))
+            self._finish(unit, error=f"{type(e).__name__}: {e}")
+        else:
+            metrics.count("rag_ingest_pages_total", unit.pages, help="Pages ingested by the job queue")
+            timings = {stage: round(sec, 4) for stage, sec in doc.timings.items()}
+            if timings:  # empty unless metrics are enabled
+                self.log.info("Ingestion unit done", unit=unit.id, job_id=unit.job_id, file=name,
+                              added=added, seconds=round(doc.total, 4), stages=timings)
+            self._finish(unit, added=added, timings=timings)
+        return True
+
+    def run_pending(self) -> int:
+        """Drain the queue synchronously (CLI / tests). Returns units processed; units still
+        waiting out a retry backoff are left pending."""
+        n = 0
+        while self.run_one():
+            n += 1
+        return n
+
+    def _worker(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                if self.run_one():
+                    continue
+            except Exception as e:
+                self.log.error("Ingestion worker error", error=str(e))
+            with self._wakeup:
+                self._wakeup.wait(timeout=1.0)
+
+    def _start_heartbeat(self) -> None:
+        if self._heartbeat is not None:
+            return
+        with self._wakeup:
+            if self._heartbeat is not None:
+                return
+            self._heartbeat_stop.clear()
+            self._heartbeat = threading.Thread(target=self._beat, name="ingest-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _beat(self) -> None:
+        """Refresh claimed_at on this queue's running units so other processes leave them alone."""
+        interval = max(1.0, self.stale_after / 3)
+        while not self._heartbeat_stop.wait(interval):
+            try:
+                self._conn().execute("UPDATE units SET claimed_at = ? WHERE status = ? AND claimed_by = ?",
+                                     (time.time(), RUNNING, self.owner))
+            except Exception as e:
+                self.log.error("Ingestion heartbeat failed", error=str(e))
+
+    def recover(self) -> int:
+        """
+        Return units whose owner stopped heartbeating (crashed worker) to the pending
+        pool; ones that already used max_attempts are marked failed instead.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._fail_abandoned(conn, now)
+            cur = conn.execute(
+                "UPDATE units SET status = ?, claimed_by = NULL, updated_at = ? "
+                "WHERE status = ? AND COALESCE(claimed_at, updated_at) < ?",
+                (PENDING, now, RUNNING, now - self.stale_after),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if cur.rowcount:
+            self.log.info("Recovered interrupted ingestion units", units=cur.rowcount)
+        return cur.rowcount
+
+    def start(self) -> None:
+        """Recover stale units and start the worker pool (daemon threads)."""
+        if self._threads:
+            return
+        self.recover()
+        self._stopping.clear()
+        self._start_heartbeat()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"ingest-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        if self._heartbeat is not None:
+            self._heartbeat_stop.set()
+            self._heartbeat.join(timeout)
+            self._heartbeat = None
+
+    # ---------- Progress ----------
+    def progress(self, job_id: str) -> Optional[dict]:
+        conn = self._conn()
+        job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if job is None:
+            return None
+        rows = conn.execute("SELECT status, page_start, page_end, added, error, timings FROM units "
+                            "WHERE job_id = ?", (job_id,)).fetchall()
+        pages = lambda r: 1 if r["page_start"] is None else r["page_end"] - r["page_start"]
+        done = [r for r in rows if r["status"] == DONE]
+        total_pages = sum(pages(r) for r in rows)
+        done_pages = sum(pages(r) for r in done)
+        stage_seconds: Dict[str, float] = {}
+        for r in done:
+            for stage, sec in json.loads(r["timings"] or "{}").items():
+                stage_seconds[stage] = round(stage_seconds.get(stage, 0.0) + sec, 4)
+        return {
+            "job_id": job_id,
+            "session_id": job["session_id"],
+            "status": job["status"],
+            "units_total": len(rows),
+            "units_done": len(done),
+            "units_failed": sum(r["status"] == FAILED for r in rows),
+            "pages_total": total_pages,
+            "pages_done": done_pages,
+            "chunks_added": sum(r["added"] for r in done),
+            "percent": round(100.0 * done_pages / total_pages, 1) if total_pages else 100.0,
+            "errors": [r["error"] for r in rows if r["status"] == FAILED][:5],
+            "stage_seconds": stage_seconds,  # self time per stage, summed over done units (metrics enabled)
+        }
+
+
+__all__ = ["IngestionJobQueue", "IngestUnit", "FaissUnitHandler", "ReadWriteLock"]
@@ -6,7 +6,8 @@ from typing import List, Tuple, Optional
 import pandas as pd
 
 from logger.custom_logger import CustomLogger
-from exception.custom_exception import DocumentPortalException
+from exception.custom_exception import DocumentPortalException, ErrorCollector
+from utils import metrics
 
 # Third-party readers (import lazily where helpful)
 import pdfplumber
@@ -21,8 +22,12 @@ class TableExtractor:
         self.log = CustomLogger.get_logger(__name__)
 
     # ---------- Public API given here ----------
-    def extract(self, file_path: str | Path) -> List[pd.DataFrame]:
-        """Return a list of DataFrames (one per detected table)"""
+    def extract(self, file_path: str | Path, page_range: Optional[Tuple[int, int]] = None) -> List[pd.DataFrame]:
+        """
+        Return a list of DataFrames (one per detected table).
+        For PDFs, page_range limits extraction to pages [start, end) and each
+        DataFrame carries its 1-based page number in df.attrs["page"].
+        """
         try:
             path = Path(file_path)
             ext = path.suffix.lower()
@@ -31,40 +36,52 @@ class TableExtractor:
                 self.log.warning("Unsupported for table extraction: %s", ext)
                 return []
 
-            if ext == ".pdf":
-                return self._from_pdf(path)
-            if ext == ".docx":
-                return self._from_docx(path)
-            if ext == ".pptx":
-                return self._from_pptx(path)
-            if ext == ".xlsx":
-                return self._from_xlsx(path)
-            if ext == ".csv":
-                return [pd.read_csv(path)]
-            if ext in (".txt", ".md"):
-                return self._from_text_like(path)
-
-            return []
+            with metrics.timer("table_extract", file=path.name, ext=ext):
+                dfs = self._dispatch(path, ext, page_range)
+            metrics.count("rag_tables_extracted_total", len(dfs), help="Tables extracted", ext=ext)
+            return dfs
         except Exception as e:
             self.log.error("Failed to extract tables: %s", e)
-            raise DocumentPortalException("Table extraction error", sys) from e
+            raise DocumentPortalException(
+                "Table extraction error", sys, code="TABLE_EXTRACTION",
+                file=Path(file_path).name, stage="table_extract",
+            ) from e
+
+    def _dispatch(self, path: Path, ext: str, page_range: Optional[Tuple[int, int]] = None) -> List[pd.DataFrame]:
+        if ext == ".pdf":
+            return self._from_pdf(path, page_range)
+        if ext == ".docx":
+            return self._from_docx(path)
+        if ext == ".pptx":
+            return self._from_pptx(path)
+        if ext == ".xlsx":
+            return self._from_xlsx(path)
+        if ext == ".csv":
+            return [pd.read_csv(path)]
+        if ext in (".txt", ".md"):
+            return self._from_text_like(path)
+        return []
 
     # ---------- Implementations ----------#
-    def _from_pdf(self, path: Path) -> List[pd.DataFrame]:
+    def _from_pdf(self, path: Path, page_range: Optional[Tuple[int, int]] = None) -> List[pd.DataFrame]:
         dfs: List[pd.DataFrame] = []
+        errors = ErrorCollector(stage="table_extract", file=path.name)
         with pdfplumber.open(str(path)) as pdf:
-            for page_idx, page in enumerate(pdf.pages, start=1):
-                try:
-                    tables = page.extract_tables() or []
-                    for t in tables:
-                        
-                        if t and all(v is not None for v in t[0]):
+            start, end = page_range or (0, len(pdf.pages))
+            for page_idx, page in enumerate(pdf.pages[start:end], start=start + 1):
+                with errors.capture(page=page_idx):
+                    for table in page.find_tables():
+                        t = table.extract()
+                        if not t:
+                            continue
+                        if all(v is not None for v in t[0]):
                             df = pd.DataFrame(t[1:], columns=t[0])
                         else:
                             df = pd.DataFrame(t)
+                        df.attrs["page"] = page_idx
+                        df.attrs["bbox"] = tuple(table.bbox)  # (x0, top, x1, bottom), lets the chunker skip it in page text
                         dfs.append(df)
-                except Exception as e:
-                    self.log.warning("PDF table parse error p%s: %s", page_idx, e)
+        errors.log_summary(self.log, "PDF table parse errors")
         self.log.info("PDF tables extracted: %s | file=%s", len(dfs), path.name)
         return dfs
 
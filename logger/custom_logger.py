@@ -1,26 +1,194 @@
 import os
+import copy
+import json
+import time
+import queue
+import atexit
 import logging
-from datetime import datetime
+import threading
+import logging.handlers
+from datetime import datetime, timezone
+
+
+# kwargs the stdlib logger understands; anything else is a structured field
+_STDLIB_KWARGS = {"exc_info", "stack_info", "stacklevel", "extra"}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Human-readable format with structured fields appended as key=value."""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " | " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; structured fields are merged at top level."""
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            for k, v in fields.items():
+                payload.setdefault(k, v)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per (logger, message template). Records at or above
+    `exempt_level` always pass so errors are never dropped. The decision is
+    stored on the record, so one instance shared by several handlers spends
+    one token per record and every handler sees the same outcome.
+    """
+
+    def __init__(self, per_second: float, burst: int = 10, exempt_level: int = logging.ERROR):
+        super().__init__()
+        self.per_second = float(per_second)
+        self.burst = float(burst)
+        self.exempt_level = exempt_level
+        self._buckets: dict = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= self.exempt_level:
+            return True
+        decided = getattr(record, "_rate_limit_passed", None)
+        if decided is not None:
+            return decided
+        record._rate_limit_passed = self._take(record)
+        return record._rate_limit_passed
+
+    def _take(self, record):
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.per_second)
+            if tokens < 1.0:
+                self._buckets[key] = (tokens, now)
+                return False
+            self._buckets[key] = (tokens - 1.0, now)
+        return True
+
+
+_EXC_FORMATTER = logging.Formatter()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener's handlers. prepare()
+    only merges args into the message and renders a traceback if there is one
+    (tracebacks can't outlive the frame cheaply); formatters run on the
+    listener thread.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """
+    Logger that accepts keyword fields, e.g. log.error("failed", error=str(e)).
+    Pass sample_every=N to emit only every Nth occurrence of a hot-loop message.
+    """
+
+    def __init__(self, logger):
+        super().__init__(logger, {})
+        self._counts: dict = {}
+        self._lock = threading.Lock()
+
+    def process(self, msg, kwargs):
+        fields = {k: kwargs.pop(k) for k in list(kwargs) if k not in _STDLIB_KWARGS}
+        if fields:
+            extra = dict(kwargs.get("extra") or {})
+            extra["fields"] = {**extra.get("fields", {}), **fields}
+            kwargs["extra"] = extra
+        return msg, kwargs
+
+    def _sampled_out(self, msg, every):
+        with self._lock:
+            n = self._counts.get(msg, 0)
+            self._counts[msg] = n + 1
+        return n % every != 0
+
+    def log(self, level, msg, *args, **kwargs):
+        if not self.isEnabledFor(level):
+            return
+        every = kwargs.pop("sample_every", None)
+        if every and every > 1 and self._sampled_out(msg, every):
+            return
+        msg, kwargs = self.process(msg, kwargs)
+        # skip this frame so %(filename)s/%(lineno)d/%(funcName)s name the real caller
+        # (logging's own frames, e.g. LoggerAdapter.info, are skipped by the stdlib)
+        kwargs["stacklevel"] = kwargs.get("stacklevel", 1) + 1
+        self.logger.log(level, msg, *args, **kwargs)
 
 
 class CustomLogger:
-    log_file_path = None  
+    log_file_path = None
+    _listener = None
 
     @staticmethod
-    def configure_logger():
+    def configure_logger(
+        async_mode: bool | None = None,
+        json_format: bool | None = None,
+        level: int = logging.INFO,
+        rate_limit_per_sec: float | None = None,
+        rate_limit_burst: int = 10,
+    ):
+        """
+        Attach file + console handlers to the root logger (once).
+
+        async_mode: route records through a QueueHandler so callers never block on
+                    disk I/O; a QueueListener thread does the actual writes.
+        json_format: emit JSON lines instead of the plain text format.
+        rate_limit_per_sec: cap repeats of the same message template (below ERROR).
+
+        Defaults come from LOG_ASYNC / LOG_JSON / LOG_RATE_LIMIT env vars.
+        """
         logger = logging.getLogger()
         if logger.handlers:
             return CustomLogger.log_file_path  # Already configured
 
+        if async_mode is None:
+            async_mode = os.getenv("LOG_ASYNC", "").lower() in ("1", "true", "yes")
+        if json_format is None:
+            json_format = os.getenv("LOG_JSON", "").lower() in ("1", "true", "yes")
+        if rate_limit_per_sec is None and os.getenv("LOG_RATE_LIMIT"):
+            rate_limit_per_sec = float(os.environ["LOG_RATE_LIMIT"])
+
         os.makedirs("logs", exist_ok=True)
         CustomLogger.log_file_path = os.path.join(
             "logs", f"{datetime.now():%m_%d_%Y_%H_%M_%S}.log"
         )
 
-        logger.setLevel(logging.INFO)
-        formatter = logging.Formatter(
-            '[%(asctime)s] %(name)s - %(levelname)s - %(message)s'
-        )
+        logger.setLevel(level)
+        if json_format:
+            formatter = JsonFormatter()
+        else:
+            formatter = KeyValueFormatter(
+                '[%(asctime)s] %(name)s - %(levelname)s - %(message)s'
+            )
 
         file_handler = logging.FileHandler(CustomLogger.log_file_path, encoding="utf-8")
         file_handler.setFormatter(formatter)
@@ -28,15 +196,40 @@ class CustomLogger:
         stream_handler = logging.StreamHandler()
         stream_handler.setFormatter(formatter)
 
-        logger.addHandler(file_handler)
-        logger.addHandler(stream_handler)
+        if async_mode:
+            q = queue.SimpleQueue()
+            queue_handler = DeferredQueueHandler(q)
+            if rate_limit_per_sec:
+                # filter before enqueueing so dropped records cost nothing downstream
+                queue_handler.addFilter(RateLimitFilter(rate_limit_per_sec, rate_limit_burst))
+            logger.addHandler(queue_handler)
+            CustomLogger._listener = logging.handlers.QueueListener(
+                q, file_handler, stream_handler, respect_handler_level=True
+            )
+            CustomLogger._listener.start()
+            atexit.register(CustomLogger.shutdown)
+        else:
+            if rate_limit_per_sec:
+                # one instance: the per-record decision is shared by both handlers
+                limiter = RateLimitFilter(rate_limit_per_sec, rate_limit_burst)
+                file_handler.addFilter(limiter)
+                stream_handler.addFilter(limiter)
+            logger.addHandler(file_handler)
+            logger.addHandler(stream_handler)
 
         logger.info(f"Logging initialized. File: {CustomLogger.log_file_path}")
         return CustomLogger.log_file_path
 
+    @staticmethod
+    def shutdown():
+        """Flush and stop the async listener, if one is running."""
+        if CustomLogger._listener is not None:
+            CustomLogger._listener.stop()
+            CustomLogger._listener = None
+
     @staticmethod
     def get_logger(name):
-        return logging.getLogger(name)
+        return StructuredLogger(logging.getLogger(name))
 
 
 # Test logger
@@ -36,6 +36,8 @@ def fake_llm(monkeypatch):
             
             if isinstance(x, dict):
                 return x.get("input") or x.get("context") or ""
+            if hasattr(x, "to_messages"):  # chat prompt value: echo the question
+                return x.to_messages()[-1].content
             return x
         
         def __or__(self, other):  # for LCEL 
@@ -47,7 +49,9 @@ def fake_llm(monkeypatch):
 @pytest.fixture
 def fake_embeddings(monkeypatch):
     """Monkeypatch ModelLoader.load_embeddings to a deterministic fake."""
-    class _FakeEmb:
+    from langchain_core.embeddings import Embeddings
+
+    class _FakeEmb(Embeddings):  # FAISS only calls .embed_query on real Embeddings instances
         def embed_query(self, text: str):
             return [float((sum(map(ord, text)) % 7) + i) for i in range(3)]
         def embed_documents(self, texts):
@@ -0,0 +1,122 @@
+# tests/test_api_server.py
+import time
+import asyncio
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+
+from api.main import ConcurrencyLimiter, RAGService, create_app
+from utils.model_loader import ModelLoader
+from tests.common_fixtures import fake_embeddings  # noqa: F401  (fixture)
+
+CFG = {"embedding_model": {"provider": "huggingface", "model_name": "m"},
+       "llm": {"provider": "Groq", "model_name": "deepseek"}}
+
+class _StubLLM:
+    """Chat-model shaped: takes a prompt value / message list, returns an AIMessage."""
+    def __init__(self):
+        self.seen = []
+
+    def invoke(self, prompt):
+        messages = prompt.to_messages()
+        self.seen.append(messages)
+        return AIMessage(content=f"answer: {messages[-1].content}")
+
+def _client(tmp_path, llm=None, **kwargs):
+    service = RAGService(data_dir=tmp_path / "uploads", faiss_base=tmp_path / "faiss",
+                         model_loader=ModelLoader(CFG), llm=llm or _StubLLM(), ingest_workers=1)
+    return TestClient(create_app(service, **kwargs))
+
+def test_upload_then_query(tmp_path, fake_embeddings):
+    llm = _StubLLM()
+    with _client(tmp_path, llm=llm) as client:
+        r = client.post("/sessions/s1/documents",
+                        files=[("files", ("notes.txt", b"Unix pipes connect processes.", "text/plain"))])
+        assert r.status_code == 202
+        job_id = r.json()["job_id"]
+
+        deadline = time.time() + 10
+        while client.get(f"/jobs/{job_id}").json()["status"] != "done" and time.time() < deadline:
+            time.sleep(0.05)
+        assert client.get(f"/jobs/{job_id}").json()["status"] == "done"
+
+        r = client.post("/query", json={"session_id": "s1", "question": "what are pipes?"})
+        assert r.status_code == 200
+        assert r.json()["answer"] == "answer: what are pipes?"
+        system, human = llm.seen[-1]
+        assert system.type == "system" and "Unix pipes connect processes." in system.content
+        assert human.type == "human" and human.content == "what are pipes?"
+
+def test_query_reports_estimated_prompt_tokens_saved(tmp_path, fake_embeddings):
+    from ingestor.context_compressor import ContextCompressor
+    service = RAGService(data_dir=tmp_path / "uploads", faiss_base=tmp_path / "faiss",
+                         model_loader=ModelLoader(CFG), llm=_StubLLM(), ingest_workers=1,
+                         compressor=ContextCompressor(token_budget=200))
+    with TestClient(create_app(service)) as client:
+        job_id = client.post("/sessions/s1/documents",
+                             files=[("files", ("notes.txt", b"Unix pipes connect processes.", "text/plain"))]
+                             ).json()["job_id"]
+        deadline = time.time() + 10
+        while client.get(f"/jobs/{job_id}").json()["status"] != "done" and time.time() < deadline:
+            time.sleep(0.05)
+        body = client.post("/query", json={"session_id": "s1", "question": "what are pipes?"}).json()
+    # the fake embeddings expose no tokenizer, so counts fall back to chars/4
+    assert body["prompt_tokens_estimated"] is True and body["context"]["tokens_estimated"] is True
+    assert "prompt_tokens_saved" in body
+
+def test_query_unknown_session_404(tmp_path, fake_embeddings):
+    with _client(tmp_path) as client:
+        r = client.post("/query", json={"session_id": "nope", "question": "q"})
+        assert r.status_code == 404
+
+@pytest.mark.parametrize("session_id", ["..", ".", "a/b", "x" * 65])
+def test_invalid_session_id_400(tmp_path, fake_embeddings, session_id):
+    with _client(tmp_path) as client:
+        r = client.post("/query", json={"session_id": session_id, "question": "q"})
+        assert r.status_code == 400
+
+def test_dot_filenames_rejected(tmp_path, fake_embeddings):
+    with _client(tmp_path) as client:
+        r = client.post("/sessions/s1/documents", files=[("files", ("..", b"x", "text/plain"))])
+        assert r.status_code == 400
+
+def test_upload_limit_checked_before_body_is_stored(tmp_path, fake_embeddings):
+    with _client(tmp_path, max_upload_bytes=1000) as client:
+        r = client.post("/sessions/s1/documents", files=[("files", ("big.txt", b"x" * 5000, "text/plain"))])
+        assert r.status_code == 413
+
+        # no Content-Length (chunked body): the limit is enforced while streaming and partial files removed
+        boundary = "b0undary"
+        def body():
+            yield (f"--{boundary}\r\nContent-Disposition: form-data; name=\"files\"; "
+                   f"filename=\"big.txt\"\r\n\r\n").encode()
+            for _ in range(10):
+                yield b"x" * 500
+        r = client.post("/sessions/s1/documents", content=body(),
+                        headers={"content-type": f"multipart/form-data; boundary={boundary}"})
+        assert r.status_code == 413
+    assert not [p for p in (tmp_path / "uploads" / "s1").rglob("*") if p.is_file()]
+
+def test_same_filename_uploads_do_not_overwrite(tmp_path, fake_embeddings):
+    with _client(tmp_path) as client:
+        for text in (b"first version", b"second version"):
+            r = client.post("/sessions/s1/documents", files=[("files", ("notes.txt", text, "text/plain"))])
+            assert r.status_code == 202 and r.json()["files"] == ["notes.txt"]
+    saved = sorted(p.read_bytes() for p in (tmp_path / "uploads" / "s1").rglob("notes.txt"))
+    assert saved == [b"first version", b"second version"]
+    assert not list((tmp_path / "uploads" / "s1").rglob("*.part"))
+
+def test_backpressure_returns_429():
+    limiter = ConcurrencyLimiter("query", limit=1)
+
+    async def scenario():
+        async with limiter.slot():
+            with pytest.raises(HTTPException) as exc:
+                async with limiter.slot():
+                    pass
+            return exc.value
+
+    err = asyncio.run(scenario())
+    assert err.status_code == 429 and err.headers["Retry-After"] == "1"
+    assert limiter.in_flight == 0
@@ -0,0 +1,96 @@
+# tests/test_chunker.py
+from pathlib import Path
+from ingestor.chunker import Chunker, chunk_id, render_table
+
+def _pages(n, body):
+    return [(i, f"ACME Corp Confidential\n\n{body(i)}\n\nPage {i} of {n}") for i in range(1, n + 1)]
+
+def test_boilerplate_headers_and_footers_dropped():
+    words = ["alpha", "beta", "gamma", "delta", "epsilon"]
+    docs = Chunker(max_tokens=200).split_pages(_pages(5, lambda i: f"Finding about {words[i - 1]}."), "r.pdf")
+    text = " ".join(d.page_content for d in docs)
+    assert "ACME Corp" not in text and "of 5" not in text
+    assert [d.metadata["page"] for d in docs] == [1, 2, 3, 4, 5]
+
+def test_token_budget_and_page_boundaries():
+    para = "word " * 40  # ~50 estimated tokens
+    pages = [(1, "\n\n".join([para] * 6)), (2, para)]
+    docs = Chunker(max_tokens=120, overlap_tokens=0).split_pages(pages, "a.pdf")
+    assert all(d.metadata["tokens"] <= 120 for d in docs)
+    assert {d.metadata["page"] for d in docs} == {1, 2}
+    assert all(d.metadata["kind"] == "text" for d in docs)
+
+def test_chunk_ids_deterministic_and_duplicates_removed():
+    pages = [(1, "Same paragraph."), (2, "Same paragraph."), (3, "Other.")]
+    a = Chunker(min_boilerplate_pages=10).split_pages(pages, "x.pdf")
+    b = Chunker(min_boilerplate_pages=10).split_pages(pages, "x.pdf")
+    assert [d.metadata["chunk_id"] for d in a] == [d.metadata["chunk_id"] for d in b]
+    assert len(a) == 2
+    assert a[0].metadata["chunk_id"] == chunk_id("x.pdf", "same   paragraph.")
+
+def test_tables_are_separate_chunks_with_header_repeated():
+    table = "name,qty\n" + "\n".join(f"item{i},{i}" for i in range(200))
+    docs = Chunker(max_tokens=100).split_pages([(1, "Intro text.")], "t.pdf", tables=[(1, table)])
+    tables = [d for d in docs if d.metadata["kind"] == "table"]
+    assert len(tables) > 1
+    assert all(d.page_content.startswith("name,qty\n") for d in tables)
+
+def test_numeric_table_content_survives_boilerplate_removal():
+    words = ["alpha", "beta", "gamma", "delta", "epsilon"]
+    # identical numeric table cells on every page, plus lines that differ only by digits
+    body = lambda i: (f"Region {i} summary\nOverview of {words[i - 1]}.\nRevenue\n1,200\nUnits\n250\n"
+                      f"Reported 2024-01-{10 + i}\nClosing remarks on {words[i - 1]}.")
+    docs = Chunker(max_tokens=200).split_pages(_pages(5, body), "r.pdf")
+    assert [d.metadata["page"] for d in docs] == [1, 2, 3, 4, 5]
+    for i, d in enumerate(docs, start=1):
+        assert f"Region {i} summary" in d.page_content and f"Reported 2024-01-{10 + i}" in d.page_content
+        assert "Revenue\n1,200\nUnits\n250" in d.page_content
+        assert "ACME Corp" not in d.page_content and "of 5" not in d.page_content
+
+def test_pdf_tables_from_extractor_and_max_seq_cap():
+    import pandas as pd
+
+    class _Extractor:
+        def extract(self, path, page_range=None):
+            df = pd.DataFrame([["bolts", 40]], columns=["item", "qty"])
+            df.attrs["page"] = 2
+            return [df]
+
+    class _Embeddings:
+        class client:
+            tokenizer = None
+            max_seq_length = 128
+
+    chunker = Chunker.for_embeddings(_Embeddings(), max_tokens=384, table_extractor=_Extractor())
+    assert chunker.max_tokens == 126
+    frames = chunker._table_frames(Path("t.pdf"), (0, 3))
+    assert [(df.attrs["page"], render_table(df)) for df in frames] == [(2, "item,qty\nbolts,40")]
+
+def test_bare_numbers_only_collapse_when_they_match_the_page():
+    words = ["alpha", "beta", "gamma", "delta", "epsilon"]
+    # each page ends on a figure that differs per page, then its bare page number
+    pages = [(i, f"Findings on {words[i - 1]}.\n{words[i - 1]} units\n{100 + 7 * i}\n{i}") for i in range(1, 6)]
+    docs = Chunker(max_tokens=200).split_pages(pages, "r.pdf")
+    assert [d.page_content for d in docs] == [
+        f"Findings on {words[i - 1]}.\n{words[i - 1]} units\n{100 + 7 * i}" for i in range(1, 6)]
+
+def test_pdf_table_text_is_not_embedded_twice(tmp_path):
+    import fitz
+    path = tmp_path / "t.pdf"
+    pdf = fitz.open()
+    page = pdf.new_page()
+    page.insert_text((72, 60), "Quarterly inventory report.")
+    cells = [["item", "qty"], ["bolts", "40"], ["nuts", "75"]]
+    for r, row in enumerate(cells):
+        for c, value in enumerate(row):
+            rect = fitz.Rect(72 + c * 120, 100 + r * 24, 192 + c * 120, 124 + r * 24)
+            page.draw_rect(rect, color=(0, 0, 0), width=0.8)
+            page.insert_text((rect.x0 + 4, rect.y0 + 16), value)
+    pdf.save(str(path))
+    pdf.close()
+
+    docs = Chunker(max_tokens=200).chunk_file(path)
+    text = [d.page_content for d in docs if d.metadata["kind"] == "text"]
+    tables = [d.page_content for d in docs if d.metadata["kind"] == "table"]
+    assert text == ["Quarterly inventory report."]
+    assert tables == ["item,qty\nbolts,40\nnuts,75"]
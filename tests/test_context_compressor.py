@@ -0,0 +1,56 @@
+# tests/test_context_compressor.py
+from langchain_core.documents import Document
+from ingestor.context_compressor import ContextCompressor, LexicalScorer
+from tests.common_fixtures import fake_embeddings  # noqa: F401  (fixture)
+
+def _doc(text, cid=None):
+    return Document(page_content=text, metadata={"chunk_id": cid} if cid else {})
+
+def test_lexical_scorer_prefers_matching_docs():
+    scores = LexicalScorer().score("unix pipes", ["cooking pasta", "unix pipes connect processes", "unix shells"])
+    assert scores[1] > scores[2] > scores[0]
+
+def test_rerank_dedupe_and_budget():
+    filler = " ".join(f"w{i}" for i in range(120))
+    docs = [
+        _doc(f"Gardening notes. {filler}", "a"),
+        _doc("Unix pipes connect processes.\n\nShared overlap paragraph.", "b"),
+        _doc("Shared overlap paragraph.\n\nPipes buffer data in unix kernels.", "c"),
+        _doc("Unix pipes connect processes.\n\nShared overlap paragraph.", "b"),
+    ]
+    kept, stats = ContextCompressor(token_budget=40).compress("unix pipes", docs, baseline_k=4)
+
+    texts = [d.page_content for d in kept]
+    assert texts[0].startswith("Unix pipes connect processes.")
+    # overlapping paragraph only sent once, duplicate chunk and off-topic filler dropped
+    assert sum(t.count("Shared overlap paragraph.") for t in texts) == 1
+    assert not any("Gardening" in t for t in texts)
+    assert stats.candidates == 4 and stats.kept == len(kept) == 2
+    assert stats.tokens_after <= 40
+    assert stats.tokens_saved == stats.tokens_baseline - stats.tokens_after > 0
+
+def test_single_oversized_doc_is_truncated_not_dropped():
+    long = " ".join(["pipes"] * 400)
+    kept, stats = ContextCompressor(token_budget=50).compress("pipes", [_doc(long)])
+    assert len(kept) == 1 and stats.tokens_after <= 50
+
+def test_stats_flag_estimated_token_counts():
+    from ingestor.chunker import TokenCounter
+
+    class _Tok:
+        def encode(self, text, add_special_tokens=False):
+            return text.split()
+
+    docs = [_doc("unix pipes connect processes")]
+    assert ContextCompressor().compress("pipes", docs)[1].estimated
+    stats = ContextCompressor(token_counter=TokenCounter(_Tok())).compress("pipes", docs)[1]
+    assert not stats.estimated and stats.tokens_after == 4
+
+def test_simple_rag_overfetches_on_a_copy_of_the_retriever(fake_embeddings):
+    from langchain_community.vectorstores import FAISS
+    from eval.rag_adapter import SimpleRAG
+    retriever = FAISS.from_texts(["unix pipes", "gardening"], fake_embeddings).as_retriever(search_kwargs={"k": 1})
+    rag = SimpleRAG(retriever, llm=object(), compressor=ContextCompressor(fetch_k=20))
+    assert retriever.search_kwargs == {"k": 1}
+    assert rag.retriever.search_kwargs == {"k": 20} and rag.baseline_k == 1
+    assert not hasattr(rag, "chain")
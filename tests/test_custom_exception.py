@@ -0,0 +1,37 @@
+# tests/test_custom_exception.py
+import sys
+import logging
+from exception.custom_exception import DocumentPortalException, ErrorCollector
+from logger.custom_logger import CustomLogger
+
+def test_exception_formats_traceback_lazily():
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        exc = DocumentPortalException("boom", sys, code="TABLE_EXTRACTION", file="a.pdf", page=7)
+    assert exc._traceback_str is None
+    text = str(exc)
+    assert "ZeroDivisionError" in text
+    assert "[TABLE_EXTRACTION]" in text and "page=7" in text
+    assert exc.to_dict()["file"] == "a.pdf"
+
+def test_exception_without_active_exception():
+    exc = DocumentPortalException("no context")
+    assert exc.file_name == "<unknown>" and exc.lineno == 0
+    assert exc.code == DocumentPortalException.default_code
+    assert "no context" in str(exc)
+
+def test_error_collector_aggregates_into_one_log(caplog):
+    log = CustomLogger.get_logger("test.collector")
+    errors = ErrorCollector(stage="table_extract", max_samples=2, file="big.pdf")
+    for page in range(1, 6):
+        with errors.capture(page=page):
+            raise ValueError(f"bad page {page}")
+    with caplog.at_level(logging.WARNING):
+        errors.log_summary(log, "PDF table parse errors")
+
+    assert len(caplog.records) == 1
+    report = caplog.records[0].fields
+    assert report["failures"] == 5 and report["file"] == "big.pdf"
+    assert report["by_type"] == {"ValueError": 5}
+    assert [s["page"] for s in report["samples"]] == [1, 2]
@@ -0,0 +1,64 @@
+# tests/test_custom_logger.py
+import sys
+import json
+import queue
+import logging
+from logger.custom_logger import CustomLogger, DeferredQueueHandler, JsonFormatter, RateLimitFilter
+
+def test_structured_fields_land_on_record(caplog):
+    log = CustomLogger.get_logger("test.fields")
+    with caplog.at_level(logging.INFO):
+        log.error("Failed to init", error="boom", page=3)
+    rec = caplog.records[-1]
+    assert rec.getMessage() == "Failed to init"
+    assert rec.fields == {"error": "boom", "page": 3}
+
+def test_sample_every_emits_every_nth(caplog):
+    log = CustomLogger.get_logger("test.sample")
+    with caplog.at_level(logging.INFO):
+        for i in range(10):
+            log.info("page %s", i, sample_every=5)
+    assert [r.getMessage() for r in caplog.records] == ["page 0", "page 5"]
+
+def test_json_formatter_merges_fields():
+    rec = logging.LogRecord("x", logging.INFO, __file__, 1, "hello %s", ("w",), None)
+    rec.fields = {"file": "a.pdf"}
+    out = json.loads(JsonFormatter().format(rec))
+    assert out["message"] == "hello w"
+    assert out["file"] == "a.pdf"
+
+def test_rate_limit_filter_drops_bursts_but_not_errors():
+    f = RateLimitFilter(per_second=0.0001, burst=2)
+    mk = lambda lvl: logging.LogRecord("x", lvl, __file__, 1, "hot", None, None)
+    passed = [f.filter(mk(logging.INFO)) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    assert f.filter(mk(logging.ERROR))
+
+def test_shared_rate_limit_filter_spends_one_token_per_record():
+    f = RateLimitFilter(per_second=0.0001, burst=4)
+    records = [logging.LogRecord("x", logging.INFO, __file__, 1, "hot", None, None) for _ in range(6)]
+    file_side = [f.filter(r) for r in records]
+    console_side = [f.filter(r) for r in records]  # second handler, same records
+    assert file_side == console_side == [True] * 4 + [False] * 2
+
+def test_deferred_queue_handler_leaves_formatting_to_listener():
+    q = queue.SimpleQueue()
+    handler = DeferredQueueHandler(q)
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        rec = logging.LogRecord("x", logging.ERROR, __file__, 1, "failed %s", ("p3",), sys.exc_info())
+    handler.handle(rec)
+    queued = q.get_nowait()
+    assert queued.getMessage() == "failed p3" and queued.exc_info is None
+    out = json.loads(JsonFormatter().format(queued))
+    assert out["message"] == "failed p3"
+    assert "ZeroDivisionError" in out["exc_info"]
+
+def test_records_report_the_real_call_site(caplog):
+    log = CustomLogger.get_logger("test.callsite")
+    with caplog.at_level(logging.INFO):
+        log.info("via info", page=1)
+        log.log(logging.WARNING, "via log")
+    assert {(r.filename, r.funcName) for r in caplog.records} == {
+        ("test_custom_logger.py", "test_records_report_the_real_call_site")}
@@ -0,0 +1,190 @@
+# tests/test_job_queue.py
+import time
+import threading
+from ingestor.job_queue import IngestionJobQueue, ReadWriteLock
+from tests.common_fixtures import fake_embeddings  # noqa: F401  (fixture)
+
+def _files(tmp_path, n):
+    paths = []
+    for i in range(n):
+        p = tmp_path / f"doc{i}.txt"
+        p.write_text(f"document {i}")
+        paths.append(p)
+    return paths
+
+def test_job_progress_and_completion(tmp_path):
+    seen = []
+    q = IngestionJobQueue(tmp_path / "jobs.sqlite", handler=lambda u: seen.append(u.file_path) or 2)
+    job_id = q.submit(_files(tmp_path, 3), session_id="s1")
+    assert q.progress(job_id)["status"] == "pending"
+
+    assert q.run_pending() == 3
+    prog = q.progress(job_id)
+    assert prog["status"] == "done"
+    assert prog["units_done"] == 3 and prog["chunks_added"] == 6 and prog["percent"] == 100.0
+    assert len(seen) == 3
+
+def test_restart_resumes_only_unfinished_units(tmp_path):
+    db = tmp_path / "jobs.sqlite"
+    first = IngestionJobQueue(db, handler=lambda u: 1)
+    job_id = first.submit(_files(tmp_path, 3))
+    assert first.run_one()          # unit 1 done
+    assert first._claim() is not None  # unit 2 left "running" -> simulated crash
+
+    seen = []
+    second = IngestionJobQueue(db, handler=lambda u: seen.append(u.id) or 1, stale_after=0)
+    assert second.recover() == 1
+    assert second.run_pending() == 2
+    assert sorted(seen) == [2, 3]
+    assert second.progress(job_id)["status"] == "done"
+
+def test_live_units_of_another_process_are_not_reclaimed(tmp_path):
+    db = tmp_path / "jobs.sqlite"
+    live = IngestionJobQueue(db, handler=lambda u: 1)
+    job_id = live.submit(_files(tmp_path, 2))
+    held = live._claim()            # unit 1 held by a live process
+
+    seen = []
+    other = IngestionJobQueue(db, handler=lambda u: seen.append(u.id) or 1)
+    assert other.recover() == 0
+    assert other.run_pending() == 1 and seen == [2]
+
+    live._finish(held, added=1)
+    assert live.progress(job_id)["status"] == "done"
+
+def test_failed_units_retry_then_fail(tmp_path):
+    def boom(unit):
+        raise RuntimeError("corrupt")
+    q = IngestionJobQueue(tmp_path / "jobs.sqlite", handler=boom, max_attempts=2, retry_backoff=0)
+    job_id = q.submit(_files(tmp_path, 1))
+    assert q.run_pending() == 2
+    prog = q.progress(job_id)
+    assert prog["status"] == "failed" and prog["units_failed"] == 1
+    assert "RuntimeError: corrupt" in prog["errors"][0]
+
+def test_failed_units_back_off_before_retry(tmp_path):
+    calls = []
+    def flaky(unit):
+        calls.append(time.time())
+        if len(calls) == 1:
+            raise RuntimeError("transient")
+        return 1
+    q = IngestionJobQueue(tmp_path / "jobs.sqlite", handler=flaky, retry_backoff=0.2)
+    job_id = q.submit(_files(tmp_path, 1))
+    assert q.run_pending() == 1          # retry not due yet
+    assert q.progress(job_id)["status"] == "running"
+    time.sleep(0.25)
+    assert q.run_pending() == 1
+    assert q.progress(job_id)["status"] == "done"
+
+def test_unit_that_keeps_killing_its_worker_ends_failed(tmp_path):
+    db = tmp_path / "jobs.sqlite"
+    job_id = IngestionJobQueue(db).submit(_files(tmp_path, 1))
+    for _ in range(2):                   # two crashed attempts: claimed, never finished
+        assert IngestionJobQueue(db, stale_after=0)._claim() is not None
+    q = IngestionJobQueue(db, handler=lambda u: 1, max_attempts=2, stale_after=0)
+    assert q.recover() == 0 and q.run_pending() == 0
+    prog = q.progress(job_id)
+    assert prog["status"] == "failed" and "Worker lost during attempt 2" in prog["errors"][0]
+
+def test_worker_pool_processes_in_background(tmp_path):
+    q = IngestionJobQueue(tmp_path / "jobs.sqlite", handler=lambda u: 1, workers=2)
+    q.start()
+    try:
+        job_id = q.submit(_files(tmp_path, 4))
+        deadline = time.time() + 5
+        while q.progress(job_id)["status"] != "done" and time.time() < deadline:
+            time.sleep(0.02)
+        assert q.progress(job_id)["units_done"] == 4
+    finally:
+        q.stop(timeout=2)
+
+def test_read_write_lock_blocks_writer_while_searching():
+    lock, order = ReadWriteLock(), []
+    def write():
+        with lock:
+            order.append("write")
+    with lock.read(), lock.read():      # readers share
+        writer = threading.Thread(target=write)
+        writer.start()
+        writer.join(0.1)
+        assert writer.is_alive()         # writer waits for readers to leave
+        order.append("read done")
+    writer.join(2)
+    assert order == ["read done", "write"]
+
+def test_progress_reports_per_stage_self_time(tmp_path):
+    from utils import metrics
+    def handler(unit):
+        with metrics.timer("chunk"):
+            time.sleep(0.02)
+        return 1
+    metrics.enable(True)
+    try:
+        q = IngestionJobQueue(tmp_path / "jobs.sqlite", handler=handler)
+        job_id = q.submit(_files(tmp_path, 2))
+        q.run_pending()
+    finally:
+        metrics.enable(False)
+        metrics.reset()
+    stages = q.progress(job_id)["stage_seconds"]
+    assert set(stages) == {"ingest_unit", "chunk"}
+    assert stages["chunk"] >= 0.04 > stages["ingest_unit"]
+
+def test_two_processes_writing_one_index_keep_both_rows(tmp_path, fake_embeddings):
+    from langchain_core.documents import Document
+    from ingestor.common_ingestor import FaissManager
+    a = FaissManager(tmp_path, embeddings=fake_embeddings)   # stand-ins for two server processes
+    a.load_or_create(texts=["seed"], metadatas=[{"source": "s"}])
+    b = FaissManager(tmp_path, embeddings=fake_embeddings)
+    b.load_or_create()
+
+    assert a.add_documents([Document(page_content="from A", metadata={"source": "a"})]) == 1
+    assert b.add_documents([Document(page_content="from B", metadata={"source": "b"})]) == 1
+
+    fresh = FaissManager(tmp_path, embeddings=fake_embeddings)
+    fresh.load_or_create()
+    texts = sorted(d.page_content for d in fresh.vs.docstore._dict.values())
+    assert texts == ["from A", "from B", "seed"] and len(fresh._meta["rows"]) == 3
+    assert a.refresh() and len(a.vs.index_to_docstore_id) == 3
+
+def test_unit_embeds_outside_the_session_lock(tmp_path, fake_embeddings):
+    from ingestor.job_queue import FaissUnitHandler, IngestUnit
+    started, release, searched = threading.Event(), threading.Event(), threading.Event()
+
+    class _SlowEmb(type(fake_embeddings)):
+        def embed_documents(self, texts):
+            started.set()
+            release.wait(2)
+            return super().embed_documents(texts)
+
+    handler = FaissUnitHandler(tmp_path / "faiss", embeddings=_SlowEmb())
+    doc = tmp_path / "a.txt"
+    doc.write_text("Unix pipes connect processes.")
+    worker = threading.Thread(target=handler, args=(IngestUnit(1, "j1", "s1", str(doc)),))
+    worker.start()
+    assert started.wait(2)
+
+    def search():
+        with handler.manager("s1")[1].read():
+            searched.set()
+    threading.Thread(target=search, daemon=True).start()
+    assert searched.wait(0.5)            # not blocked while the unit is embedding
+    release.set()
+    worker.join(2)
+    assert handler.manager("s1")[0].vs is not None
+
+def test_vectors_saved_without_meta_are_skipped_on_resume(tmp_path, fake_embeddings):
+    from langchain_core.documents import Document
+    from ingestor.common_ingestor import FaissManager
+    docs = [Document(page_content=t, metadata={"source": "a.pdf"}) for t in ("one", "two")]
+    fm = FaissManager(tmp_path, embeddings=fake_embeddings)
+    fm.load_or_create(texts=["seed"], metadatas=[{"source": "s"}])
+    meta_before = (tmp_path / "ingested_meta.json").read_text()
+    assert fm.add_documents(docs) == 2
+    (tmp_path / "ingested_meta.json").write_text(meta_before)   # crash after save_local, before the meta write
+
+    resumed = FaissManager(tmp_path, embeddings=fake_embeddings)
+    resumed.load_or_create()
+    assert resumed.add_documents(docs) == 0
+    assert len(resumed.vs.index_to_docstore_id) == 3
@@ -0,0 +1,49 @@
+# tests/test_metrics.py
+import time
+import pytest
+from utils import metrics
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.reset()
+    metrics.enable(True)
+    yield metrics
+    metrics.enable(False)
+    metrics.reset()
+
+def test_timer_is_noop_when_disabled():
+    metrics.enable(False)
+    metrics.reset()
+    with metrics.timer("parse"):
+        pass
+    assert metrics.render_prometheus().strip() == ""
+    assert metrics.export_spans() == []
+
+def test_document_context_attributes_nested_stages(enabled_metrics):
+    t0 = time.perf_counter()
+    with metrics.document_context("a.pdf") as doc:
+        with metrics.timer("parse"):
+            with metrics.timer("table_extract"):
+                time.sleep(0.05)
+    wall = time.perf_counter() - t0
+    assert set(doc.timings) == {"parse", "table_extract"}
+    # self time only: the nested stage is not counted again under its parent
+    assert doc.timings["parse"] < 0.05 <= doc.timings["table_extract"]
+    assert doc.total <= wall
+
+    spans = {s["name"]: s for s in metrics.export_spans()}
+    assert spans["table_extract"]["parent_span_id"] == spans["parse"]["span_id"]
+    assert spans["parse"]["parent_span_id"] == spans["document"]["span_id"]
+    assert len({s["trace_id"] for s in spans.values()}) == 1
+    assert spans["parse"]["attributes"]["document.id"] == "a.pdf"
+
+def test_prometheus_export_and_error_status(enabled_metrics):
+    with pytest.raises(RuntimeError):
+        with metrics.timer("llm"):
+            raise RuntimeError("boom")
+    metrics.count("rag_pages_parsed_total", 3, help="PDF pages parsed")
+    text = metrics.render_prometheus()
+    assert 'rag_stage_calls_total{stage="llm",status="error"} 1' in text
+    assert 'rag_stage_duration_seconds_bucket{stage="llm",le="+Inf"} 1' in text
+    assert "# TYPE rag_pages_parsed_total counter" in text
+    assert "rag_pages_parsed_total 3" in text
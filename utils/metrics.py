@@ -0,0 +1,298 @@
+# utils/metrics.py
+"""
+Lightweight in-process instrumentation: counters, histograms and spans.
+
+Disabled by default; enable with METRICS_ENABLED=1 or metrics.enable(). While
+disabled, timer()/count()/observe() return immediately (timer() hands back a
+shared no-op context manager), so call sites can stay in hot paths.
+
+    from utils import metrics
+
+    with metrics.document_context("report.pdf") as doc:
+        with metrics.timer("parse", file="report.pdf"):
+            ...
+    doc.timings            # {"parse": 0.41, ...}  self time, nested stages excluded
+    metrics.render_prometheus()
+    metrics.export_spans()
+"""
+from __future__ import annotations
+
+import os
+import time
+import uuid
+import threading
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+_enabled: bool = os.getenv("METRICS_ENABLED", "").lower() in ("1", "true", "yes")
+
+
+def enable(flag: bool = True) -> None:
+    global _enabled
+    _enabled = bool(flag)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+# ---------------- Metric types ----------------
+def _label_key(labels: Dict[str, object]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(key: Iterable[Tuple[str, str]], le: Optional[str] = None) -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in key]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str = "") -> None:
+        self.name = name
+        self.help = help
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, v in sorted(self._values.items()):
+            lines.append(f"{self.name}{_fmt_labels(key)} {v:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts..., sum, count]
+        self._values: Dict[tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def count(self, **labels) -> int:
+        row = self._values.get(_label_key(labels))
+        return int(row[-1]) if row else 0
+
+    def sum(self, **labels) -> float:
+        row = self._values.get(_label_key(labels))
+        return row[-2] if row else 0.0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, row in sorted(self._values.items()):
+            for i, b in enumerate(self.buckets):
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, f'{b:g}')} {row[i]:g}")
+            lines.append(f"{self.name}_bucket{_fmt_labels(key, '+Inf')} {row[-1]:g}")
+            lines.append(f"{self.name}_sum{_fmt_labels(key)} {row[-2]:g}")
+            lines.append(f"{self.name}_count{_fmt_labels(key)} {row[-1]:g}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, max_spans: int = 10_000) -> None:
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.spans: deque = deque(maxlen=max_spans)
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = Counter(name, help)
+            return m  # type: ignore[return-value]
+
+    def histogram(self, name: str, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = Histogram(name, help, buckets)
+            return m  # type: ignore[return-value]
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())  # type: ignore[attr-defined]
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._metrics.clear()
+            self.spans.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = "rag_stage_duration_seconds"
+STAGE_CALLS = "rag_stage_calls_total"
+
+
+# ---------------- Spans + per-document attribution ----------------
+class DocumentTimings:
+    """
+    Self time per stage while a document_context() was active: a stage's time
+    excludes the stages nested inside it, so `total` is not double-counted.
+    """
+
+    def __init__(self, doc_id: str) -> None:
+        self.doc_id = doc_id
+        self.timings: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    @property
+    def total(self) -> float:
+        return sum(self.timings.values())
+
+
+_current_span: ContextVar[Optional["_Span"]] = ContextVar("rag_current_span", default=None)
+_current_doc: ContextVar[Optional[DocumentTimings]] = ContextVar("rag_current_doc", default=None)
+
+
+class _Span:
+    """Times a stage, records the histogram/counter and an OTel-shaped span."""
+
+    __slots__ = ("stage", "attributes", "trace_id", "span_id", "parent_id",
+                 "_t0", "_start_ns", "_token", "_parent", "_child_seconds")
+
+    def __init__(self, stage: str, attributes: Dict[str, object]) -> None:
+        self.stage = stage
+        self.attributes = attributes
+
+    def __enter__(self) -> "_Span":
+        parent = _current_span.get()
+        self._parent = parent
+        self._child_seconds = 0.0
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.parent_id = parent.span_id if parent else None
+        self.span_id = uuid.uuid4().hex[:16]
+        self._start_ns = time.time_ns()
+        self._t0 = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        elapsed = time.perf_counter() - self._t0
+        _current_span.reset(self._token)
+        if self._parent is not None:
+            self._parent._child_seconds += elapsed
+        status = "error" if exc_type else "ok"
+        REGISTRY.histogram(STAGE_SECONDS, "Wall time per pipeline stage").observe(elapsed, stage=self.stage)
+        REGISTRY.counter(STAGE_CALLS, "Pipeline stage invocations").inc(stage=self.stage, status=status)
+        doc = _current_doc.get()
+        if doc is not None and self.stage != "document":
+            doc.add(self.stage, max(0.0, elapsed - self._child_seconds))
+        REGISTRY.spans.append({
+            "name": self.stage,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self._start_ns,
+            "end_time_unix_nano": self._start_ns + int(elapsed * 1e9),
+            "attributes": {**self.attributes, **({"document.id": doc.doc_id} if doc else {})},
+            "status": {"code": "ERROR" if exc_type else "OK"},
+        })
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _DocumentContext:
+    def __init__(self, doc_id: str, attributes: Dict[str, object]) -> None:
+        self.doc = DocumentTimings(doc_id)
+        self._span = _Span("document", {"document.id": doc_id, **attributes}) if _enabled else None
+
+    def __enter__(self) -> DocumentTimings:
+        self._token = _current_doc.set(self.doc)
+        if self._span is not None:
+            self._span.__enter__()
+        return self.doc
+
+    def __exit__(self, *exc) -> bool:
+        if self._span is not None:
+            self._span.__exit__(*exc)
+        _current_doc.reset(self._token)
+        return False
+
+
+# ---------------- Public helpers ----------------
+def timer(stage: str, **attributes):
+    """Context manager timing one pipeline stage (no-op when disabled)."""
+    if not _enabled:
+        return _NOOP
+    return _Span(stage, attributes)
+
+
+def document_context(doc_id: str, **attributes) -> _DocumentContext:
+    """Attribute every timer() inside the block to one uploaded document."""
+    return _DocumentContext(doc_id, attributes)
+
+
+def count(name: str, value: float = 1.0, help: str = "", **labels) -> None:
+    if _enabled:
+        REGISTRY.counter(name, help).inc(value, **labels)
+
+
+def observe(name: str, value: float, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **labels) -> None:
+    if _enabled:
+        REGISTRY.histogram(name, help, buckets).observe(value, **labels)
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render_prometheus()
+
+
+def export_spans(clear: bool = True) -> List[dict]:
+    """Finished spans as OpenTelemetry-style dicts (oldest first)."""
+    spans = list(REGISTRY.spans)
+    if clear:
+        REGISTRY.spans.clear()
+    return spans
+
+
+def reset() -> None:
+    REGISTRY.reset()
@@ -5,6 +5,7 @@ from typing import Any, Dict, Optional
 from dotenv import load_dotenv, find_dotenv  # <-- add this
 from logger.custom_logger import CustomLogger
 from utils.config_loader import load_config
+from utils import metrics
 
 # Embeddings providers
 from langchain_community.embeddings import HuggingFaceEmbeddings
@@ -18,18 +19,24 @@ from langchain_groq import ChatGroq
 
 
 class ModelLoader:
-    def __init__(self, config: Optional[Dict[str, Any]] = None) -> None:
+    def __init__(self, config: Optional[Dict[str, Any]] = None, http_client: Any = None) -> None:
         # Always load .env first
         load_dotenv(find_dotenv(), override=True)
 
         self.log = CustomLogger.get_logger(__name__)
         self.config = config or load_config()
+        # optional shared httpx.Client so every ChatGroq reuses one connection pool
+        self.http_client = http_client
 
         self.log.info("Environment variables validated")
         self.log.info("Config loaded successfully")
 
     # ---------------- Embeddings ----------------
     def load_embeddings(self):
+        with metrics.timer("embeddings_load"):
+            return self._load_embeddings()
+
+    def _load_embeddings(self):
         self.log.info("Loading embedding model (customize as needed)")
         self.log.info("loading embedding models")
 
@@ -54,6 +61,10 @@ class ModelLoader:
 
     # ---------------- LLM ----------------
     def load_llm(self):
+        with metrics.timer("llm_load"):
+            return self._load_llm()
+
+    def _load_llm(self):
         self.log.info("Loading LLM (customize as needed)")
         llm_cfg = self.config.get("llm", {})
         model_name = llm_cfg.get("model_name")
@@ -64,4 +75,7 @@ class ModelLoader:
         max_tokens = llm_cfg.get("max_output_tokens", 2048)
 
         # ChatGroq will now always find GROQ_API_KEY from os.environ
+        if self.http_client is not None:
+            return ChatGroq(model=model_name, temperature=temperature, max_tokens=max_tokens,
+                            http_client=self.http_client)
         return ChatGroq(model=model_name, temperature=temperature, max_tokens=max_tokens)